@@ -0,0 +1,139 @@
+"""
+Benchmarks connectors offline, against local stand-ins for their upstream APIs.
+
+Each scenario in scenarios/ is run in its own process from the connector's
+directory, driving the connector's create_app() through POST /search. The
+measurements are written to a JSON results file and can be compared against a
+baseline to catch regressions.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+SCENARIOS_DIR = os.path.join(BENCHMARK_DIR, "scenarios")
+RUNNER = os.path.join(BENCHMARK_DIR, "runner.py")
+
+# Measurements where a higher value is a regression, and the ones where a lower value is
+HIGHER_IS_WORSE = ["p50_ms", "p95_ms", "p99_ms", "max_rss_kb"]
+LOWER_IS_WORSE = ["throughput_rps"]
+
+
+def list_scenarios():
+    return sorted(
+        name.removesuffix(".json")
+        for name in os.listdir(SCENARIOS_DIR)
+        if name.endswith(".json")
+    )
+
+
+def run_scenario(name, args):
+    scenario_path = os.path.join(SCENARIOS_DIR, f"{name}.json")
+    with open(scenario_path) as f:
+        connector = json.load(f)["connector"]
+
+    # Use the connector's own environment, since every connector has its own dependencies
+    python = ["poetry", "run", "python"] if args.poetry else [sys.executable]
+    command = [
+        *python,
+        RUNNER,
+        scenario_path,
+        f"--requests={args.requests}",
+        f"--concurrency={args.concurrency}",
+        f"--warmup={args.warmup}",
+    ]
+    if args.latency_ms is not None:
+        command.append(f"--latency-ms={args.latency_ms}")
+    if args.jitter_ms is not None:
+        command.append(f"--jitter-ms={args.jitter_ms}")
+
+    process = subprocess.run(
+        command,
+        cwd=os.path.join(REPO_DIR, connector),
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode != 0:
+        output = process.stderr.strip().splitlines()
+        return {"error": output[-1] if output else f"Exit status {process.returncode}"}
+
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline or "error" in result or "error" in baseline[name]:
+            continue
+        for metric in HIGHER_IS_WORSE:
+            if result[metric] > baseline[name][metric] * (1 + tolerance):
+                regressions.append(
+                    f"{name}: {metric} {result[metric]} > baseline {baseline[name][metric]}"
+                )
+        for metric in LOWER_IS_WORSE:
+            if result[metric] < baseline[name][metric] * (1 - tolerance):
+                regressions.append(
+                    f"{name}: {metric} {result[metric]} < baseline {baseline[name][metric]}"
+                )
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "scenarios",
+        nargs="*",
+        help=f"Scenarios to run, all by default: {', '.join(list_scenarios())}",
+    )
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument(
+        "--latency-ms", type=float, help="Override the scenario's upstream latency"
+    )
+    parser.add_argument(
+        "--jitter-ms", type=float, help="Override the scenario's upstream jitter"
+    )
+    parser.add_argument(
+        "--poetry",
+        action="store_true",
+        help="Run each scenario with `poetry run python` in the connector directory",
+    )
+    parser.add_argument("--output", default=os.path.join(BENCHMARK_DIR, "results.json"))
+    parser.add_argument(
+        "--baseline",
+        help="Compare the results against this baseline file, exiting with status 1 on regressions",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Allowed relative difference from the baseline, 0.2 by default",
+    )
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.scenarios or list_scenarios():
+        results[name] = run_scenario(name, args)
+        print(f"{name}: {json.dumps(results[name])}", file=sys.stderr)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Runs one benchmark scenario against the connector in the current working
+directory and prints the measurements as a single JSON object.
+
+It is started by benchmark.py inside the connector's own environment, since
+every connector is a separate `provider` package with its own dependencies.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import resource
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from stub import StubProcess
+
+CONNECTOR_API_KEY = "benchmark"
+
+
+def rewrite_url(url, hosts, stub_url):
+    # https://api.github.com/search/code -> http://127.0.0.1:<port>/api.github.com/search/code
+    parts = urlsplit(str(url))
+    if parts.hostname not in hosts:
+        return url
+    rewritten = f"{stub_url}/{parts.hostname}{parts.path}"
+    return f"{rewritten}?{parts.query}" if parts.query else rewritten
+
+
+def install_host_rewrites(hosts, stub_url):
+    """
+    Send requests for the hard-coded upstream hosts to the stub server instead,
+    for both requests and aiohttp based clients.
+    """
+    import requests
+
+    request = requests.Session.request
+
+    def rewriting_request(self, method, url, *args, **kwargs):
+        return request(self, method, rewrite_url(url, hosts, stub_url), *args, **kwargs)
+
+    requests.Session.request = rewriting_request
+
+    try:
+        import aiohttp
+    except ImportError:
+        return
+
+    aiohttp_request = aiohttp.ClientSession._request
+
+    def rewriting_aiohttp_request(self, method, str_or_url, *args, **kwargs):
+        return aiohttp_request(
+            self, method, rewrite_url(str_or_url, hosts, stub_url), *args, **kwargs
+        )
+
+    aiohttp.ClientSession._request = rewriting_aiohttp_request
+
+
+def configure_environment(scenario, stub_url):
+    prefix = os.path.split(os.getcwd())[1].upper()
+    env = {"CONNECTOR_API_KEY": CONNECTOR_API_KEY, **scenario.get("env", {})}
+    for key, value in env.items():
+        if isinstance(value, (dict, list)):
+            value = json.dumps(value)
+        os.environ[f"{prefix}_{key}"] = str(value).replace("{stub}", stub_url or "")
+
+
+def percentile(latencies, percent):
+    # Nearest-rank percentile over the sorted latencies
+    index = max(0, round(percent / 100 * len(latencies)) - 1)
+    return latencies[index]
+
+
+def current_rss_kb():
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        return None
+
+
+def run(scenario, requests_count, concurrency, warmup, latency_ms, jitter_ms):
+    stub = None
+    if routes := scenario.get("routes"):
+        stub = StubProcess(
+            routes,
+            latency_ms=(
+                scenario.get("latency_ms", 0) if latency_ms is None else latency_ms
+            ),
+            jitter_ms=scenario.get("jitter_ms", 0) if jitter_ms is None else jitter_ms,
+        ).start()
+        install_host_rewrites(set(scenario.get("hosts", [])), stub.url)
+
+    configure_environment(scenario, stub.url if stub else None)
+    sys.path.insert(0, os.getcwd())
+    from provider import create_app
+
+    app = create_app()
+    client = app.test_client()
+    headers = {
+        "Authorization": f"Bearer {scenario.get('bearer_token', CONNECTOR_API_KEY)}"
+    }
+    queries = itertools.cycle(scenario["queries"])
+
+    def search(query):
+        start = time.perf_counter()
+        response = client.post("/search", json={"query": query}, headers=headers)
+        elapsed = time.perf_counter() - start
+        # A failed search, or one that doesn't return a list of results, counts
+        # as an error instead of aborting the run
+        body = response.get_json(silent=True)
+        results = body.get("results") if isinstance(body, dict) else None
+        if response.status_code != 200:
+            return elapsed, f"HTTP {response.status_code}", 0
+        if not isinstance(results, list):
+            return elapsed, "response without a list of results", 0
+        return elapsed, None, len(results)
+
+    for query in itertools.islice(queries, warmup):
+        if error := search(query)[1]:
+            raise RuntimeError(f"Warmup search for {query!r} failed: {error}")
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        start = time.perf_counter()
+        measurements = list(
+            executor.map(search, itertools.islice(queries, requests_count))
+        )
+        wall_time = time.perf_counter() - start
+
+    if stub:
+        stub.stop()
+
+    latencies = sorted(elapsed * 1000 for elapsed, _, _ in measurements)
+    return {
+        "requests": requests_count,
+        "concurrency": concurrency,
+        "errors": sum(1 for _, error, _ in measurements if error),
+        "results_per_search": statistics.mean(count for _, _, count in measurements),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(statistics.mean(latencies), 3),
+        "throughput_rps": round(requests_count / wall_time, 2),
+        "rss_kb": current_rss_kb(),
+        # ru_maxrss is reported in kilobytes on Linux
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "unmatched_upstream_requests": sorted(set(stub.unmatched)) if stub else [],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("scenario", help="Path to the scenario JSON file")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=None)
+    parser.add_argument("--jitter-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    with open(args.scenario) as f:
+        scenario = json.load(f)
+
+    result = run(
+        scenario,
+        args.requests,
+        args.concurrency,
+        args.warmup,
+        args.latency_ms,
+        args.jitter_ms,
+    )
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
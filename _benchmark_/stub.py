@@ -0,0 +1,144 @@
+import json
+import multiprocessing
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+
+class Route:
+    """
+    A recorded upstream response. Requests match a route by method and by the
+    full path, without the query string, against a regular expression.
+    """
+
+    def __init__(self, method, path, status=200, headers=None, body=None, text=None):
+        self.method = method.upper()
+        self.path = re.compile(path)
+        self.status = status
+        self.headers = headers or {}
+        if body is not None:
+            self.content = json.dumps(body).encode()
+            self.headers.setdefault("Content-Type", "application/json")
+        else:
+            self.content = (text or "").encode()
+            self.headers.setdefault("Content-Type", "text/plain")
+
+    def matches(self, method, path):
+        return self.method == method and self.path.fullmatch(path) is not None
+
+
+class StubServer:
+    """
+    Local HTTP server that replays recorded upstream responses after a simulated
+    network latency of latency_ms, plus or minus a uniformly distributed jitter_ms.
+    """
+
+    def __init__(self, routes, latency_ms=0, jitter_ms=0):
+        self.routes = [Route(**route) for route in routes]
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.unmatched = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def _delay(self):
+        delay_ms = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _reply(self):
+                # Drain the request body so the connection can be kept alive
+                if length := int(self.headers.get("Content-Length") or 0):
+                    self.rfile.read(length)
+
+                path = urlsplit(self.path).path
+                route = next(
+                    (r for r in stub.routes if r.matches(self.command, path)), None
+                )
+                stub._delay()
+
+                if route is None:
+                    stub.unmatched.append(f"{self.command} {path}")
+                    status, headers, content = 404, {}, b""
+                else:
+                    status, headers, content = (
+                        route.status,
+                        route.headers,
+                        route.content,
+                    )
+
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _reply
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _serve(routes, latency_ms, jitter_ms, connection):
+    stub = StubServer(routes, latency_ms, jitter_ms).start()
+    connection.send(stub.url)
+    # Serve until the parent asks to stop, then report the unmatched requests
+    connection.recv()
+    stub.stop()
+    connection.send(stub.unmatched)
+
+
+class StubProcess:
+    """
+    StubServer run in a separate process, so its CPU time and memory aren't
+    counted in the measurements of the connector under test.
+    """
+
+    def __init__(self, routes, latency_ms=0, jitter_ms=0):
+        # Spawned rather than forked, so the child doesn't inherit the connector
+        context = multiprocessing.get_context("spawn")
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(
+            target=_serve,
+            args=(routes, latency_ms, jitter_ms, child_connection),
+            daemon=True,
+        )
+        self.url = None
+        self.unmatched = []
+
+    def start(self):
+        self.process.start()
+        self.url = self.connection.recv()
+        return self
+
+    def stop(self):
+        self.connection.send(None)
+        self.unmatched = self.connection.recv()
+        self.process.join()
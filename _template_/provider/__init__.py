@@ -4,10 +4,12 @@ import os
 import connexion  # type: ignore
 from dotenv import load_dotenv
 
+from . import circuitbreaker, deadline, hedging, metrics, ratelimit, tracing
+
 load_dotenv()
 
 
-API_VERSION = "api.yaml"
+API_VERSION = "api-template.yaml"
 
 
 class UpstreamProviderError(Exception):
@@ -19,7 +21,7 @@ class UpstreamProviderError(Exception):
 
 
 def create_app() -> connexion.FlaskApp:
-    # use connexion to create a Flask app with the endpoints defined in api.yaml spec
+    # use connexion to create a Flask app with the endpoints defined in api-template.yaml spec
     app = connexion.FlaskApp(__name__, specification_dir="../../.openapi")
     app.add_api(
         API_VERSION, resolver=connexion.resolver.RelativeResolver("provider.app")
@@ -30,4 +32,15 @@ def create_app() -> connexion.FlaskApp:
     config_prefix = os.path.split(os.getcwd())[1].upper().replace("_", "")
     flask_app.config.from_prefixed_env(config_prefix)
     flask_app.config["APP_ID"] = config_prefix
+    # expose request, upstream and cache metrics for Prometheus on /metrics
+    metrics.init_app(flask_app)
+    # trace requests with OpenTelemetry when TRACING_EXPORTER is set
+    tracing.init_app(flask_app)
+    # give every search a time budget, see deadline.py
+    deadline.init_app(flask_app)
+    # rate limit upstream calls per host and credential
+    ratelimit.init_app(flask_app)
+    # stop calling failing upstream hosts, and hedge slow calls if enabled
+    circuitbreaker.init_app(flask_app)
+    hedging.init_app(flask_app)
     return flask_app
@@ -1,10 +1,52 @@
+import contextvars
+import json
 import logging
-from flask import abort, current_app as app
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Response, abort, current_app as app, request, stream_with_context
 from connexion.exceptions import Unauthorized
 
-from . import UpstreamProviderError, provider
+from . import UpstreamProviderError, deadline, metrics, provider, tracing
+from .singleflight import SingleFlight, search_key
 
 logger = logging.getLogger(__name__)
+AUTHORIZATION_HEADER = "Authorization"
+NDJSON_MIMETYPE = "application/x-ndjson"
+SSE_MIMETYPE = "text/event-stream"
+
+# Identical searches running at the same time share a single upstream search
+searches = SingleFlight()
+
+
+def run_search(query):
+    with tracing.span("provider.search"):
+        data = provider.search(query)
+    return data, deadline.current().partial
+
+
+def coalesced_search(query, authorization):
+    if not app.config.get("SINGLE_FLIGHT_ENABLED", True):
+        return run_search(query)
+
+    search_deadline = deadline.current()
+    try:
+        data, partial = searches.do(
+            search_key(query, authorization),
+            lambda: run_search(query),
+            timeout=search_deadline.wait_timeout(),
+        )
+    except deadline.DeadlineExceeded:
+        if search_deadline.expired:
+            raise
+        # The search ran out of the time of a caller with a shorter deadline
+        return run_search(query)
+
+    if partial and not search_deadline.partial and not search_deadline.expired:
+        # Results cut short by the deadline of another caller sharing the
+        # search, which was shorter than this one: search again
+        return run_search(query)
+    return data, partial
 
 
 def search(body):
@@ -14,14 +56,142 @@ def search(body):
     """
     logger.debug(f'Search request: {body["query"]}')
 
+    mimetype = request.accept_mimetypes.best_match(
+        ["application/json", NDJSON_MIMETYPE, SSE_MIMETYPE]
+    )
+    if mimetype in (NDJSON_MIMETYPE, SSE_MIMETYPE):
+        return stream_search(body["query"], mimetype)
+
     try:
-        data = provider.search(body["query"])
+        data, partial = coalesced_search(
+            body["query"], request.headers.get(AUTHORIZATION_HEADER)
+        )
         logger.info(f"Found {len(data)} results")
+    except deadline.DeadlineExceeded:
+        logger.warning("Search deadline exceeded before any results were found")
+        data, partial = [], True
     except UpstreamProviderError as error:
         logger.error(f"Upstream search error: {error.message}")
+        metrics.record_error(error)
         abort(502, error.message)
 
-    return {"results": data}, 200, {"X-Connector-Id": app.config.get("APP_ID")}
+    metrics.record_search_results(len(data))
+
+    response = {"results": data}
+    if partial:
+        # Some upstream calls didn't complete before the deadline
+        response["partial"] = True
+
+    return response, 200, {"X-Connector-Id": app.config.get("APP_ID")}
+
+
+def format_record(kind, data, mimetype):
+    if mimetype == SSE_MIMETYPE:
+        return f"event: {kind}\ndata: {json.dumps(data)}\n\n"
+    return json.dumps({kind: data}) + "\n"
+
+
+def stream_search(query, mimetype):
+    """
+    Streams each result as soon as provider.iter_search yields it, as NDJSON
+    lines or server-sent events, followed by a summary with the number of
+    results, whether they are partial, any error and the timings. Streamed
+    searches aren't coalesced with identical searches in flight.
+    """
+    search_deadline = deadline.current()
+    start = time.perf_counter()
+
+    def records():
+        count, first_result_ms, errors = 0, None, []
+        try:
+            with tracing.span("provider.iter_search"):
+                for result in provider.iter_search(query):
+                    if first_result_ms is None:
+                        first_result_ms = round((time.perf_counter() - start) * 1000)
+                    count += 1
+                    yield format_record("result", result, mimetype)
+        except deadline.DeadlineExceeded:
+            search_deadline.mark_partial()
+        except UpstreamProviderError as error:
+            logger.error(f"Upstream search error: {error.message}")
+            metrics.record_error(error)
+            errors.append(error.message)
+
+        logger.info(f"Streamed {count} results")
+        metrics.record_search_results(count)
+        summary = {
+            "results": count,
+            "partial": search_deadline.partial,
+            "errors": errors,
+            "first_result_ms": first_result_ms,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000),
+        }
+        yield format_record("summary", summary, mimetype)
+
+    def records_before_deadline():
+        # The request's deadline is reset when the view returns, before the body
+        # is streamed, so it is set again for the search
+        token = deadline.current_deadline.set(search_deadline)
+        try:
+            yield from records()
+        finally:
+            deadline.current_deadline.reset(token)
+
+    return Response(
+        stream_with_context(records_before_deadline()),
+        mimetype=mimetype,
+        headers={
+            "X-Connector-Id": app.config.get("APP_ID"),
+            "Cache-Control": "no-cache",
+            # Stops proxies such as nginx from buffering the stream
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+def search_batch(body):
+    """
+    Entrypoint for the /search/batch endpoint. The queries are searched
+    concurrently, sharing the deadline, clients and caches of the connector,
+    and each one gets its own results or error.
+    """
+    queries = body["queries"]
+    logger.debug(f"Batch search request: {queries}")
+
+    flask_app = app._get_current_object()
+    authorization = request.headers.get(AUTHORIZATION_HEADER)
+    batch_deadline = deadline.current()
+
+    def search_query(query):
+        # Runs in a worker thread, without the request context
+        with flask_app.app_context():
+            deadline.current_deadline.set(batch_deadline.branch())
+            try:
+                data, partial = coalesced_search(query, authorization)
+            except deadline.DeadlineExceeded:
+                data, partial = [], True
+            except UpstreamProviderError as error:
+                logger.error(f"Upstream search error for {query!r}: {error.message}")
+                metrics.record_error(error)
+                return {"query": query, "error": error.message}
+
+        metrics.record_search_results(len(data))
+        result = {"query": query, "results": data}
+        if partial:
+            result["partial"] = True
+        return result
+
+    max_workers = min(len(queries), app.config.get("BATCH_MAX_WORKERS", 8))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            # Each query runs in a copy of this context, for the deadline and tracing
+            executor.submit(contextvars.copy_context().run, search_query, query)
+            for query in queries
+        ]
+        results = [future.result() for future in futures]
+
+    logger.info(f"Found {sum(len(r.get('results', [])) for r in results)} results")
+    return {"results": results}, 200, {"X-Connector-Id": app.config.get("APP_ID")}
 
 
 # This function is run for all endpoints to ensure requests are using a valid API key
@@ -0,0 +1,127 @@
+import logging
+import threading
+import time
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+breakers = None
+
+
+class CircuitOpen(requests.RequestException):
+    """
+    Raised instead of calling an upstream host that is failing, until the
+    circuit breaker lets a probe call through.
+    """
+
+
+class CircuitBreaker:
+    """
+    Stops calling a host after failure_threshold consecutive failures, which
+    are errors, 5xx responses, or responses slower than latency_threshold.
+    After reset_seconds a single probe call is let through: the circuit closes
+    again if it succeeds, and stays open for another reset_seconds otherwise.
+    """
+
+    def __init__(self, host, failure_threshold, reset_seconds, latency_threshold):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.latency_threshold = latency_threshold
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def before_call(self):
+        """
+        Raises CircuitOpen if the host can't be called, and returns True if
+        the call is the probe, which must end with record() or release().
+        """
+        with self.lock:
+            if self.state == CLOSED:
+                return False
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.reset_seconds:
+                    raise CircuitOpen(f"Circuit breaker for {self.host} is open")
+                self.state = HALF_OPEN
+            if self.probing:
+                raise CircuitOpen(f"Circuit breaker for {self.host} is half open")
+            self.probing = True
+            return True
+
+    def release(self):
+        # Ends a probe that couldn't tell whether the host recovered
+        with self.lock:
+            self.probing = False
+
+    def record(self, success):
+        with self.lock:
+            self.probing = False
+            if success:
+                if self.state != CLOSED:
+                    logger.info(f"Circuit breaker for {self.host} closed")
+                self.state = CLOSED
+                self.failures = 0
+                return
+
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state == CLOSED:
+                    logger.warning(
+                        f"Circuit breaker for {self.host} opened after {self.failures} failures"
+                    )
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def record_response(self, response, elapsed):
+        self.record(
+            response.status_code < 500
+            and (self.latency_threshold is None or elapsed <= self.latency_threshold)
+        )
+
+
+class CircuitBreakers:
+    def __init__(self, failure_threshold, reset_seconds, latency_threshold):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.latency_threshold = latency_threshold
+        self.breakers = {}
+        self.lock = threading.Lock()
+
+    def get(self, host):
+        with self.lock:
+            if host not in self.breakers:
+                self.breakers[host] = CircuitBreaker(
+                    host,
+                    self.failure_threshold,
+                    self.reset_seconds,
+                    self.latency_threshold,
+                )
+            return self.breakers[host]
+
+
+def init_app(flask_app):
+    """
+    Configure a circuit breaker for each upstream host. It opens after
+    CIRCUIT_BREAKER_FAILURES consecutive failures, counting responses slower
+    than CIRCUIT_BREAKER_LATENCY_SECONDS if set, and probes the host again
+    after CIRCUIT_BREAKER_RESET_SECONDS.
+    """
+    global breakers
+
+    if not flask_app.config.get("CIRCUIT_BREAKER_ENABLED", True):
+        return
+
+    latency_threshold = flask_app.config.get("CIRCUIT_BREAKER_LATENCY_SECONDS")
+    breakers = CircuitBreakers(
+        failure_threshold=flask_app.config.get("CIRCUIT_BREAKER_FAILURES", 5),
+        reset_seconds=flask_app.config.get("CIRCUIT_BREAKER_RESET_SECONDS", 30),
+        latency_threshold=(
+            float(latency_threshold) if latency_threshold not in (None, "") else None
+        ),
+    )
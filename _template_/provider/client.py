@@ -1,5 +1,7 @@
 from flask import current_app as app
 
+from .upstream import get_session
+
 client = None
 
 
@@ -8,6 +10,9 @@ class ExampleAPIClient:
         # Define any class parameters here. If they are absolutely necessary for the client
         # to function, they should be asserted when being retrieved in the external get_client() method
         self.example = example
+        # Make HTTP calls to the upstream service with this session, so they are
+        # included in the connector metrics, e.g. self.session.get(url, params=params)
+        self.session = get_session()
 
     def search(self, query):
         data = [
@@ -0,0 +1,156 @@
+import contextvars
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed, wait
+
+from flask import current_app as app, g, request
+
+DEADLINE_HEADER = "X-Deadline-Seconds"
+DEFAULT_DEADLINE_SECONDS = 30
+
+current_deadline = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Deadline:
+    """
+    Time budget of a search. Every upstream call gets the remaining time as its
+    timeout, and results that completed in time are returned marked as partial
+    rather than failing the whole search when the budget runs out.
+    """
+
+    def __init__(self, seconds):
+        self.expires_at = time.monotonic() + seconds
+        self.partial = False
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def wait_timeout(self):
+        # Timeout for waiting on futures or events, None when there is no deadline
+        remaining = self.remaining()
+        return None if math.isinf(remaining) else remaining
+
+    @property
+    def expired(self):
+        return self.remaining() == 0
+
+    def timeout(self, timeout=None):
+        """
+        Timeout for a requests call: the given timeout, as a number or a
+        (connect, read) tuple, capped to the remaining time.
+        """
+        if (remaining := self.remaining()) == 0:
+            raise DeadlineExceeded()
+
+        if math.isinf(remaining):
+            return timeout
+        if timeout is None:
+            return remaining
+        if isinstance(timeout, tuple):
+            return tuple(remaining if t is None else min(t, remaining) for t in timeout)
+        return min(timeout, remaining)
+
+    def branch(self):
+        """
+        Deadline with the same expiry but its own partial flag, for one of the
+        searches of a batch.
+        """
+        branch = Deadline(0)
+        branch.expires_at = self.expires_at
+        return branch
+
+    def mark_partial(self):
+        self.partial = True
+
+
+def current():
+    # Outside of a request, e.g. in a shell, there is no deadline
+    return current_deadline.get() or Deadline(float("inf"))
+
+
+def fan_out(function, items, max_workers=10):
+    """
+    Fans function out over items in threads and returns the results completed
+    before the deadline, in the order of items. The search is marked as partial
+    when some are dropped.
+    """
+    deadline = current()
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = [
+        # Each call runs in a copy of the caller's context, so it sees the deadline
+        executor.submit(contextvars.copy_context().run, function, item)
+        for item in items
+    ]
+    done, not_done = wait(futures, timeout=deadline.wait_timeout())
+    # Calls still running are left to time out in the background, since their
+    # upstream timeouts are capped to the deadline too
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    if not_done:
+        deadline.mark_partial()
+
+    results = []
+    for future in futures:
+        if future not in done:
+            continue
+        if isinstance(error := future.exception(), DeadlineExceeded):
+            deadline.mark_partial()
+        elif error is not None:
+            raise error
+        else:
+            results.append(future.result())
+
+    return results
+
+
+def fan_out_as_completed(function, items, max_workers=10):
+    """
+    Like fan_out, but yields the results as they complete, for streaming.
+    """
+    deadline = current()
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = [
+        executor.submit(contextvars.copy_context().run, function, item)
+        for item in items
+    ]
+    try:
+        for future in as_completed(futures, timeout=deadline.wait_timeout()):
+            if isinstance(error := future.exception(), DeadlineExceeded):
+                deadline.mark_partial()
+            elif error is not None:
+                raise error
+            else:
+                yield future.result()
+    except TimeoutError:
+        deadline.mark_partial()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _start_deadline():
+    seconds = float(app.config.get("DEADLINE_SECONDS", DEFAULT_DEADLINE_SECONDS))
+    if header := request.headers.get(DEADLINE_HEADER):
+        try:
+            # Callers can only shorten the configured deadline
+            seconds = min(seconds, float(header))
+        except ValueError:
+            pass
+    g.deadline_token = current_deadline.set(Deadline(seconds))
+
+
+def _end_deadline(error):
+    if token := g.pop("deadline_token", None):
+        current_deadline.reset(token)
+
+
+def init_app(flask_app):
+    """
+    Give every request a deadline of DEADLINE_SECONDS, or of the number of
+    seconds in the X-Deadline-Seconds header when that is shorter.
+    """
+    flask_app.before_request(_start_deadline)
+    flask_app.teardown_request(_end_deadline)
@@ -0,0 +1,95 @@
+import contextvars
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from . import metrics
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+# Latencies of the last calls to each host, from which the hedging delay is taken
+LATENCY_WINDOW = 100
+# Calls to a host are only hedged once this many latencies have been recorded
+MIN_SAMPLES = 20
+
+hedger = None
+
+
+class Hedger:
+    """
+    Hedged requests: when an idempotent call to a host takes longer than the
+    95th percentile of its recent latencies, a duplicate call is sent and the
+    first response to arrive wins. This trims the tail latency caused by a
+    slow upstream server or connection, for about 5% more upstream calls.
+    """
+
+    def __init__(self, max_workers):
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="hedging"
+        )
+        self.latencies = {}
+        self.lock = threading.Lock()
+
+    def record_latency(self, host, seconds):
+        with self.lock:
+            self.latencies.setdefault(host, deque(maxlen=LATENCY_WINDOW)).append(
+                seconds
+            )
+
+    def delay(self, host):
+        with self.lock:
+            latencies = sorted(self.latencies.get(host, ()))
+        if len(latencies) < MIN_SAMPLES:
+            return None
+        return latencies[int(len(latencies) * 0.95) - 1]
+
+    def send(self, send, request, host):
+        """
+        Sends request with send, hedged with a copy of it if it's slower than
+        the 95th percentile for host. send is called with hedge=True for the
+        copy, and can raise instead of sending it.
+        """
+        if (
+            request.method not in IDEMPOTENT_METHODS
+            or (delay := self.delay(host)) is None
+        ):
+            return send(request)
+
+        primary = self.submit(send, request)
+        if wait([primary], timeout=delay).done:
+            return primary.result()
+
+        hedge = self.submit(send, request.copy(), True)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                # A failed call only loses if the other one can still succeed
+                if future.exception() is None or not pending:
+                    for loser in pending:
+                        loser.add_done_callback(close_response)
+                    metrics.record_hedged_request(
+                        host, "hedge" if future is hedge else "primary"
+                    )
+                    return future.result()
+
+    def submit(self, send, request, hedge=False):
+        # Run in a copy of the caller's context, for the deadline and tracing
+        return self.executor.submit(
+            contextvars.copy_context().run, send, request, hedge
+        )
+
+
+def close_response(future):
+    if future.exception() is None:
+        future.result().close()
+
+
+def init_app(flask_app):
+    """
+    Hedge idempotent upstream calls when HEDGING_ENABLED is set, using up to
+    HEDGING_MAX_WORKERS threads for the calls in flight.
+    """
+    global hedger
+
+    if flask_app.config.get("HEDGING_ENABLED", False):
+        hedger = Hedger(flask_app.config.get("HEDGING_MAX_WORKERS", 32))
@@ -0,0 +1,119 @@
+import os
+import time
+
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+REQUEST_SECONDS = Histogram(
+    "connector_request_seconds",
+    "Time spent handling connector requests",
+    ["endpoint", "method", "status"],
+)
+UPSTREAM_REQUEST_SECONDS = Histogram(
+    "connector_upstream_request_seconds",
+    "Time spent in calls to upstream services, by host and endpoint",
+    ["host", "endpoint", "status"],
+)
+SEARCH_RESULTS = Histogram(
+    "connector_search_results",
+    "Number of results returned by a search",
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200),
+)
+RESPONSE_BYTES = Histogram(
+    "connector_response_bytes",
+    "Size of connector response payloads",
+    ["endpoint"],
+    buckets=(1e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6, 1e7),
+)
+CACHE_LOOKUPS = Counter(
+    "connector_cache_lookups_total",
+    "Cache lookups, the hit ratio is hits divided by all lookups",
+    ["cache", "result"],
+)
+HEDGED_REQUESTS = Counter(
+    "connector_hedged_requests_total",
+    "Upstream calls that were hedged, by host and by the call that answered first",
+    ["host", "winner"],
+)
+ERRORS = Counter(
+    "connector_errors_total",
+    "Errors raised while handling connector requests, by class",
+    ["error_class"],
+)
+
+
+def record_upstream_request(host, endpoint, status, seconds):
+    UPSTREAM_REQUEST_SECONDS.labels(host, endpoint, str(status)).observe(seconds)
+
+
+def record_cache_lookup(cache, hit):
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def record_hedged_request(host, winner):
+    HEDGED_REQUESTS.labels(host, winner).inc()
+
+
+def record_error(error):
+    ERRORS.labels(type(error).__name__).inc()
+
+
+def record_search_results(count):
+    SEARCH_RESULTS.observe(count)
+
+
+def _start_timer():
+    g.metrics_start = time.perf_counter()
+
+
+def _observe_request(response):
+    if (start := g.pop("metrics_start", None)) is None:
+        return response
+
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    REQUEST_SECONDS.labels(endpoint, request.method, str(response.status_code)).observe(
+        time.perf_counter() - start
+    )
+    if not response.is_streamed:
+        RESPONSE_BYTES.labels(endpoint).observe(response.calculate_content_length())
+
+    return response
+
+
+def _record_unhandled_error(error):
+    if error is not None:
+        record_error(error)
+
+
+def _metrics_view():
+    # With several gunicorn workers, each worker writes its metrics to
+    # PROMETHEUS_MULTIPROC_DIR and they are aggregated here
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_app(flask_app):
+    """
+    Time every request and expose the collected metrics on /metrics, in the
+    Prometheus text format. The endpoint can be disabled with METRICS_ENABLED.
+    """
+    if not flask_app.config.get("METRICS_ENABLED", True):
+        return
+
+    flask_app.before_request(_start_timer)
+    flask_app.after_request(_observe_request)
+    flask_app.teardown_request(_record_unhandled_error)
+    flask_app.add_url_rule("/metrics", "metrics", _metrics_view)
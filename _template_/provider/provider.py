@@ -1,6 +1,9 @@
 import logging
-from typing import Any
+from typing import Any, Iterator
 
+import requests
+
+from . import UpstreamProviderError, tracing
 from .client import get_client
 
 logger = logging.getLogger(__name__)
@@ -15,8 +18,26 @@ def search(query) -> list[dict[str, Any]]:
     """
     example_client = get_client()
 
-    search_results = example_client.search(query)
-    return [serialize_result(result) for result in search_results]
+    try:
+        search_results = example_client.search(query)
+    except requests.RequestException as error:
+        # Includes calls stopped by a circuit breaker or the rate limit
+        raise UpstreamProviderError(
+            f"Error calling the upstream service: {error}"
+        ) from error
+
+    with tracing.span("serialize", results=len(search_results)):
+        return [serialize_result(result) for result in search_results]
+
+
+def iter_search(query) -> Iterator[dict[str, Any]]:
+    """
+    Streaming variant of search, used when the caller asks for a streamed
+    response. It should yield each serialized result as soon as it is ready.
+    Connectors fetching results with several upstream calls can yield from
+    deadline.fan_out_as_completed(), so a slow call doesn't hold back the others.
+    """
+    yield from search(query)
 
 
 def serialize_result(entry) -> dict[str, str]:
@@ -0,0 +1,259 @@
+import hashlib
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+DEFAULT_MAX_WAIT_SECONDS = 5
+# Limiter state of hosts that haven't been called for this long is dropped
+STATE_TTL_SECONDS = 3600
+
+limiter = None
+
+
+class RateLimitExceeded(requests.RequestException):
+    """
+    Raised instead of calling the upstream service when a call would have to
+    wait longer than allowed for the rate limit.
+    """
+
+
+def bucket_key(host, authorization):
+    # Quotas are usually per credential, so each one gets its own bucket per host
+    credential = hashlib.sha256((authorization or "").encode()).hexdigest()[:16]
+    return f"{host}:{credential}"
+
+
+def parse_reset(value, now):
+    # Either a number of seconds until the reset, or an epoch timestamp as GitHub sends
+    if value is None:
+        return None
+    try:
+        reset = float(value)
+    except ValueError:
+        return None
+    return reset if reset > 1e9 else now + reset
+
+
+def parse_retry_after(value, now):
+    # Either a number of seconds, or an HTTP date
+    if value is None:
+        return None
+    try:
+        return now + float(value)
+    except ValueError:
+        pass
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class MemoryBackend:
+    """
+    Token buckets kept in this process.
+    """
+
+    def __init__(self):
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def reserve(self, key, rate, capacity, max_wait, now):
+        with self.lock:
+            bucket = self.buckets.setdefault(
+                key,
+                {
+                    "tokens": capacity,
+                    "capacity": capacity,
+                    "rate": rate,
+                    "updated_at": now,
+                    "blocked_until": 0,
+                },
+            )
+            return reserve(bucket, max_wait, now)
+
+    def update(self, key, now, **state):
+        with self.lock:
+            if key in self.buckets:
+                self.buckets[key].update(state)
+            # Drop buckets of hosts that haven't been called for a while
+            for stale in [
+                stale
+                for stale, bucket in self.buckets.items()
+                if bucket["updated_at"] < now - STATE_TTL_SECONDS
+            ]:
+                del self.buckets[stale]
+
+
+def reserve(bucket, max_wait, now):
+    """
+    Takes a token from the bucket, returning how long to wait before the call,
+    or None without taking a token when that is longer than max_wait. The token
+    count goes negative while calls are queued.
+    """
+    rate = bucket["rate"]
+    if rate:
+        elapsed = now - bucket["updated_at"]
+        bucket["tokens"] = min(bucket["capacity"], bucket["tokens"] + elapsed * rate)
+    bucket["updated_at"] = now
+
+    ready_at = max(now, bucket["blocked_until"])
+    if rate and bucket["tokens"] < 1:
+        ready_at = max(ready_at, now + (1 - bucket["tokens"]) / rate)
+
+    if (wait := ready_at - now) > max_wait:
+        return None
+    bucket["tokens"] -= 1
+    return wait
+
+
+# Same as reserve(), atomically in Redis so workers share the buckets
+RESERVE_SCRIPT = """
+local key, rate, capacity = KEYS[1], tonumber(ARGV[1]), tonumber(ARGV[2])
+local max_wait, now, ttl = tonumber(ARGV[3]), tonumber(ARGV[4]), tonumber(ARGV[5])
+local state = redis.call("HMGET", key, "tokens", "capacity", "rate", "updated_at", "blocked_until")
+local tokens = tonumber(state[1]) or capacity
+capacity = tonumber(state[2]) or capacity
+rate = tonumber(state[3]) or rate
+local updated_at = tonumber(state[4]) or now
+local blocked_until = tonumber(state[5]) or 0
+if rate > 0 then
+    tokens = math.min(capacity, tokens + (now - updated_at) * rate)
+end
+local ready_at = math.max(now, blocked_until)
+if rate > 0 and tokens < 1 then
+    ready_at = math.max(ready_at, now + (1 - tokens) / rate)
+end
+local wait = ready_at - now
+if wait > max_wait then
+    return nil
+end
+redis.call("HSET", key, "tokens", tokens - 1, "capacity", capacity, "rate", rate, "updated_at", now, "blocked_until", blocked_until)
+redis.call("EXPIRE", key, ttl)
+return tostring(wait)
+"""
+
+
+class RedisBackend:
+    """
+    Token buckets kept in Redis, shared by every gunicorn worker and replica.
+    """
+
+    def __init__(self, url):
+        self.client = redis.Redis.from_url(url)
+        self.script = self.client.register_script(RESERVE_SCRIPT)
+
+    def reserve(self, key, rate, capacity, max_wait, now):
+        wait = self.script(
+            keys=[f"ratelimit:{key}"],
+            args=[rate or 0, capacity, max_wait, now, STATE_TTL_SECONDS],
+        )
+        return None if wait is None else float(wait)
+
+    def update(self, key, now, **state):
+        self.client.hset(f"ratelimit:{key}", mapping=state)
+
+
+class RateLimiter:
+    """
+    Client-side rate limiting of upstream calls with a token bucket per host
+    and credential. Buckets start from the configured rate, if any, and adapt
+    to the X-RateLimit-* and Retry-After headers of the upstream responses.
+    Calls wait up to max_wait seconds for a token rather than failing.
+    """
+
+    def __init__(self, backend, rates=None, default_rate=None, burst=None, max_wait=5):
+        self.backend = backend
+        self.rates = rates or {}
+        self.default_rate = default_rate
+        self.burst = burst
+        self.max_wait = max_wait
+
+    def reserve(self, key, host, max_wait=None):
+        # Returns how long to wait before calling host, for async callers
+        rate = self.rates.get(host, self.default_rate)
+        capacity = self.burst or max(1, rate or 1)
+        max_wait = self.max_wait if max_wait is None else min(max_wait, self.max_wait)
+
+        wait = self.backend.reserve(key, rate, capacity, max_wait, time.time())
+        if wait is None:
+            raise RateLimitExceeded(f"Rate limit of {host} exceeded")
+        return wait
+
+    def acquire(self, key, host, max_wait=None):
+        if (wait := self.reserve(key, host, max_wait)) > 0:
+            time.sleep(wait)
+
+    def observe(self, key, response):
+        """
+        Learns the limit from the response headers: a Retry-After or an
+        exhausted quota blocks the bucket until then, and otherwise the
+        remaining quota is spread over the time left until it resets.
+        """
+        headers = response.headers
+        now = time.time()
+        state = {}
+
+        remaining = parse_int(
+            headers.get("X-RateLimit-Remaining", headers.get("RateLimit-Remaining"))
+        )
+        reset = parse_reset(
+            headers.get("X-RateLimit-Reset", headers.get("RateLimit-Reset")), now
+        )
+        if remaining is not None and reset is not None and reset > now:
+            # The upstream's count is the truth, and allows bursts up to it
+            state["tokens"] = remaining
+            state["capacity"] = max(remaining, 1)
+            if remaining == 0:
+                state["blocked_until"] = reset
+            else:
+                state["rate"] = remaining / (reset - now)
+
+        retry_after = parse_retry_after(headers.get("Retry-After"), now)
+        if retry_after is not None and retry_after > now:
+            state["blocked_until"] = max(state.get("blocked_until", 0), retry_after)
+
+        if state:
+            self.backend.update(key, now, **state)
+
+
+def init_app(flask_app):
+    """
+    Configure rate limiting of upstream calls. Limits are learned from the
+    upstream responses, and can also be set per host with RATE_LIMITS, or
+    for every host with RATE_LIMIT_PER_SECOND. Set RATE_LIMIT_REDIS_URL to
+    share the limits between workers.
+    """
+    global limiter
+
+    if not flask_app.config.get("RATE_LIMIT_ENABLED", True):
+        return
+
+    if redis_url := flask_app.config.get("RATE_LIMIT_REDIS_URL"):
+        assert redis is not None, "RATE_LIMIT_REDIS_URL requires the redis package"
+        backend = RedisBackend(redis_url)
+    else:
+        backend = MemoryBackend()
+
+    limiter = RateLimiter(
+        backend,
+        rates=flask_app.config.get("RATE_LIMITS"),
+        default_rate=flask_app.config.get("RATE_LIMIT_PER_SECOND"),
+        burst=flask_app.config.get("RATE_LIMIT_BURST"),
+        max_wait=flask_app.config.get(
+            "RATE_LIMIT_MAX_WAIT_SECONDS", DEFAULT_MAX_WAIT_SECONDS
+        ),
+    )
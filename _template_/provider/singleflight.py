@@ -0,0 +1,62 @@
+import hashlib
+import threading
+
+from . import metrics
+from .deadline import DeadlineExceeded
+
+
+class Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller runs the
+    function, and callers arriving while it is in flight wait for it and share
+    its result, or its exception, for up to timeout seconds. Nothing is cached
+    once the call completes.
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def do(self, key, function, timeout=None):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = Call()
+
+        metrics.record_cache_lookup("singleflight", not leader)
+        if not leader:
+            if not call.done.wait(timeout):
+                raise DeadlineExceeded()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+        return call.result
+
+
+def search_key(query, authorization):
+    """
+    Searches are shared by callers with the same credentials only, since
+    connectors using per-user OAuth tokens return different results per user.
+    Queries differing only in whitespace are the same search.
+    """
+    principal = hashlib.sha256((authorization or "").encode()).hexdigest()
+    return " ".join(query.split()), principal
@@ -0,0 +1,149 @@
+import contextlib
+import functools
+
+from flask import g, request
+
+try:
+    from opentelemetry import context, propagate, trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+except ImportError:
+    trace = None
+
+tracer = None
+
+
+def get_exporter(exporter, file):
+    if exporter == "otlp":
+        # The collector endpoint is read from OTEL_EXPORTER_OTLP_ENDPOINT,
+        # http://localhost:4318 by default
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+            OTLPSpanExporter,
+        )
+
+        return OTLPSpanExporter()
+
+    if exporter == "file":
+        assert file, "TRACING_FILE must be set when TRACING_EXPORTER is file"
+        # One JSON document per finished span
+        return ConsoleSpanExporter(
+            out=open(file, "a"),
+            formatter=lambda span: span.to_json(indent=None) + "\n",
+        )
+
+    raise AssertionError("TRACING_EXPORTER must be either otlp or file")
+
+
+@contextlib.contextmanager
+def span(name, **attributes):
+    """
+    Trace the enclosed block as a child of the current span, for instance around
+    an upstream call, a database query or a document parse. Does nothing when
+    tracing is disabled.
+    """
+    if tracer is None:
+        yield None
+        return
+
+    with tracer.start_as_current_span(name, attributes=attributes) as current:
+        yield current
+
+
+def start_span(name, **attributes):
+    # For spans that can't wrap a block, such as in callbacks. The caller ends them
+    if tracer is None:
+        return None
+
+    return tracer.start_span(name, attributes=attributes)
+
+
+def end_span(current, error=None):
+    if current is None:
+        return
+
+    if error is not None:
+        current.record_exception(error)
+        current.set_status(trace.Status(trace.StatusCode.ERROR))
+    current.end()
+
+
+def with_context(function):
+    """
+    Run function in the trace context of the caller, so spans created from a
+    ThreadPoolExecutor used to fan out a search stay in the same trace.
+    """
+    if tracer is None:
+        return function
+
+    parent = context.get_current()
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        token = context.attach(parent)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            context.detach(token)
+
+    return wrapper
+
+
+def inject(headers):
+    # Propagate the current trace to the upstream service in the traceparent header
+    if tracer is not None:
+        propagate.inject(headers)
+
+
+def _start_request_span():
+    rule = request.url_rule.rule if request.url_rule else "unmatched"
+    current = tracer.start_span(
+        f"{request.method} {rule}",
+        context=propagate.extract(request.headers),
+        kind=trace.SpanKind.SERVER,
+        attributes={"http.request.method": request.method, "http.route": rule},
+    )
+    g.tracing_span = current
+    g.tracing_token = context.attach(trace.set_span_in_context(current))
+
+
+def _end_request_span(response):
+    if current := g.get("tracing_span"):
+        current.set_attribute("http.response.status_code", response.status_code)
+    return response
+
+
+def _close_request_span(error):
+    if (current := g.pop("tracing_span", None)) is None:
+        return
+
+    end_span(current, error)
+    context.detach(g.pop("tracing_token"))
+
+
+def init_app(flask_app):
+    """
+    Trace requests with OpenTelemetry when TRACING_EXPORTER is set, exporting
+    spans to an OTLP collector (otlp) or appending them to TRACING_FILE (file).
+    """
+    global tracer
+
+    if not (exporter := flask_app.config.get("TRACING_EXPORTER")):
+        return
+
+    assert (
+        trace is not None
+    ), "TRACING_EXPORTER requires the tracing extra: poetry install --extras tracing"
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": flask_app.config["APP_ID"].lower()})
+    )
+    provider.add_span_processor(
+        BatchSpanProcessor(get_exporter(exporter, flask_app.config.get("TRACING_FILE")))
+    )
+    trace.set_tracer_provider(provider)
+    tracer = provider.get_tracer(__name__)
+
+    flask_app.before_request(_start_request_span)
+    flask_app.after_request(_end_request_span)
+    flask_app.teardown_request(_close_request_span)
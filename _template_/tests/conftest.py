@@ -0,0 +1,45 @@
+import pytest
+from provider import create_app
+
+
+class AuthenticatedTestClient:
+    """
+    Helper class to test logic around connector API calls without
+    needing to setup authorization each time. This assumes the authentication
+    schema uses Bearer auth.
+    """
+
+    DEFAULT_API_KEY = "secret"
+
+    def __init__(self, client):
+        self.client = client
+
+    def post(self, *args, **kwargs):
+        headers = kwargs.get("headers", {})
+        headers["Authorization"] = f"Bearer {self.DEFAULT_API_KEY}"
+        kwargs["headers"] = headers
+        return self.client.post(*args, **kwargs)
+
+
+@pytest.fixture
+def app():
+    app = create_app()
+    yield app
+
+
+@pytest.fixture
+def authed_client(app, configure_app_env):
+    configure_app_env({"CONNECTOR_API_KEY": AuthenticatedTestClient.DEFAULT_API_KEY})
+
+    return AuthenticatedTestClient(app.test_client())
+
+
+@pytest.fixture
+def configure_app_env(app):
+    # Fixture to configure the app and modify config during test runtime
+    # Accepts a dictionary of key-value pairs
+    def _configure_app_env(configs):
+        for key, value in configs.items():
+            app.config[key] = value
+
+    return _configure_app_env
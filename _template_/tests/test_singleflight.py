@@ -0,0 +1,77 @@
+import threading
+import time
+from unittest.mock import patch
+
+from provider import deadline
+
+SLOW_RESULT_SECONDS = 0.5
+
+
+def fetch(delay):
+    time.sleep(delay)
+    return {"id": str(delay)}
+
+
+def fan_out_search(query):
+    # One fast and one slow upstream call, so a short deadline drops one result
+    return deadline.fan_out(fetch, [0, SLOW_RESULT_SECONDS])
+
+
+def concurrent_searches(authed_client, headers):
+    # Runs the searches concurrently, each one starting while the first is in flight
+    responses = [None] * len(headers)
+
+    def post(index):
+        responses[index] = authed_client.post(
+            "/search", json={"query": "test"}, headers=headers[index]
+        )
+
+    threads = [threading.Thread(target=post, args=(i,)) for i in range(len(headers))]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.05)
+    for thread in threads:
+        thread.join()
+
+    return responses
+
+
+def test_identical_searches_are_coalesced(authed_client):
+    with patch("provider.provider.search", side_effect=fan_out_search) as search:
+        responses = concurrent_searches(authed_client, [{}, {}])
+
+    assert search.call_count == 1
+    for response in responses:
+        assert response.status_code == 200
+        assert len(response.get_json()["results"]) == 2
+        assert "partial" not in response.get_json()
+
+
+def test_partial_results_of_shorter_deadline_are_not_shared(authed_client):
+    with patch("provider.provider.search", side_effect=fan_out_search) as search:
+        leader, follower = concurrent_searches(
+            authed_client, [{deadline.DEADLINE_HEADER: "0.2"}, {}]
+        )
+
+    assert leader.get_json() == {"results": [{"id": "0"}], "partial": True}
+    # The follower has a longer deadline, so it searches again for every result
+    assert search.call_count == 2
+    assert len(follower.get_json()["results"]) == 2
+    assert "partial" not in follower.get_json()
+
+
+def test_deadline_exceeded_of_shorter_deadline_is_not_shared(authed_client):
+    def slow_search(query):
+        if deadline.current().remaining() < 1:
+            # Fail once the follower is waiting for this search
+            time.sleep(0.1)
+            raise deadline.DeadlineExceeded()
+        return [fetch(SLOW_RESULT_SECONDS)]
+
+    with patch("provider.provider.search", side_effect=slow_search):
+        leader, follower = concurrent_searches(
+            authed_client, [{deadline.DEADLINE_HEADER: "0.2"}, {}]
+        )
+
+    assert leader.get_json() == {"results": [], "partial": True}
+    assert follower.get_json() == {"results": [{"id": "0.5"}]}
@@ -0,0 +1,104 @@
+import io
+import time
+from unittest.mock import patch
+
+import pytest
+import requests
+
+from provider import circuitbreaker, deadline, hedging, ratelimit, upstream
+
+HOST = "upstream.example.com"
+URL = f"https://{HOST}/search"
+
+
+def time_out(self, request, **kwargs):
+    time.sleep(kwargs["timeout"])
+    raise requests.ReadTimeout()
+
+
+def respond_slowly(sent):
+    def send(self, request, **kwargs):
+        sent.append(request)
+        time.sleep(0.1)
+        response = requests.Response()
+        response.status_code = 200
+        response.raw = io.BytesIO(b'{"results": []}')
+        return response
+
+    return send
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    breakers = circuitbreaker.CircuitBreakers(
+        failure_threshold=2, reset_seconds=0, latency_threshold=None
+    )
+    monkeypatch.setattr(circuitbreaker, "breakers", breakers)
+    return breakers.get(HOST)
+
+
+def test_deadline_timeouts_dont_open_the_circuit(breaker):
+    session = upstream.UpstreamSession()
+
+    with patch("requests.Session.send", time_out):
+        for _ in range(3):
+            token = deadline.current_deadline.set(deadline.Deadline(0.05))
+            try:
+                with pytest.raises(deadline.DeadlineExceeded):
+                    session.get(URL, timeout=10)
+            finally:
+                deadline.current_deadline.reset(token)
+
+    assert breaker.state == circuitbreaker.CLOSED
+
+
+def test_upstream_timeouts_open_the_circuit(breaker):
+    session = upstream.UpstreamSession()
+
+    with patch("requests.Session.send", time_out):
+        for _ in range(2):
+            with pytest.raises(requests.ReadTimeout):
+                session.get(URL, timeout=0.01)
+
+    assert breaker.state == circuitbreaker.OPEN
+
+
+def test_probe_without_outcome_lets_the_next_call_probe(breaker):
+    session = upstream.UpstreamSession()
+    breaker.record(False)
+    breaker.record(False)
+
+    with patch("requests.Session.send", side_effect=ValueError("Bad request")):
+        with pytest.raises(ValueError):
+            session.get(URL)
+
+    assert breaker.state == circuitbreaker.HALF_OPEN
+    assert not breaker.probing
+
+
+def test_hedges_are_rate_limited(monkeypatch):
+    session = upstream.UpstreamSession()
+    limiter = ratelimit.RateLimiter(ratelimit.MemoryBackend(), default_rate=1)
+    monkeypatch.setattr(ratelimit, "limiter", limiter)
+    hedger = hedging.Hedger(max_workers=2)
+    for _ in range(hedging.MIN_SAMPLES):
+        hedger.record_latency(HOST, 0.01)
+    monkeypatch.setattr(hedging, "hedger", hedger)
+    sent = []
+
+    with patch("requests.Session.send", respond_slowly(sent)):
+        response = session.get(URL)
+
+    assert response.status_code == 200
+    # The rate limit only had a token for the first call
+    assert len(sent) == 1
+
+
+def test_open_circuit_fails_the_search(authed_client):
+    with patch(
+        "provider.client.ExampleAPIClient.search",
+        side_effect=circuitbreaker.CircuitOpen(f"Circuit breaker for {HOST} is open"),
+    ):
+        response = authed_client.post("/search", json={"query": "test"})
+
+    assert response.status_code == 502
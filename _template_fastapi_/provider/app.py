@@ -1,22 +1,195 @@
+import asyncio
+import json
 import logging
-from typing import Optional
+import time
+from typing import AsyncIterator, Optional
 
 from fastapi import Depends, FastAPI, HTTPException, Header, Response, status
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import StreamingResponse
 
+import circuitbreaker
+import deadline
+import hedging
+import metrics
 import provider
+import ratelimit
+import tracing
 from config import AppConfig
-from datamodels import SearchRequest, SearchResponse
+from datamodels import (
+    SearchBatchRequest,
+    SearchBatchResponse,
+    SearchBatchResult,
+    SearchRequest,
+    SearchResponse,
+)
 from exceptions import UpstreamProviderError
+from singleflight import SingleFlight, search_key
 
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+SSE_MEDIA_TYPE = "text/event-stream"
+
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 app = FastAPI()
 config = AppConfig()
+# expose request, upstream and cache metrics for Prometheus on /metrics
+metrics.init_app(app, config.METRICS_ENABLED)
+# trace requests with OpenTelemetry when TRACING_EXPORTER is set
+tracing.init_app(app, config.CONNECTOR_ID, config.TRACING_EXPORTER, config.TRACING_FILE)
+# give every search a time budget, see deadline.py
+deadline.init_app(app, config.DEADLINE_SECONDS)
+# rate limit upstream calls per host and credential
+ratelimit.init_app(
+    config.RATE_LIMIT_ENABLED,
+    config.RATE_LIMIT_REDIS_URL,
+    config.RATE_LIMITS,
+    config.RATE_LIMIT_PER_SECOND,
+    config.RATE_LIMIT_BURST,
+    config.RATE_LIMIT_MAX_WAIT_SECONDS,
+)
+# stop calling failing upstream hosts, and hedge slow calls if enabled
+circuitbreaker.init_app(
+    config.CIRCUIT_BREAKER_ENABLED,
+    config.CIRCUIT_BREAKER_FAILURES,
+    config.CIRCUIT_BREAKER_RESET_SECONDS,
+    config.CIRCUIT_BREAKER_LATENCY_SECONDS,
+)
+hedging.init_app(config.HEDGING_ENABLED, config.HEDGING_MAX_WORKERS)
 
 logger.info(f"CONNECTOR_ID: {config.CONNECTOR_ID}")
 
+# Identical searches running at the same time share a single upstream search
+searches = SingleFlight()
+
+
+async def run_search(query: str):
+    # provider.search blocks, run it in a worker thread to keep serving other requests
+    with tracing.span("provider.search"):
+        data = await run_in_threadpool(provider.search, query)
+    return data, deadline.current().partial
+
+
+async def coalesced_search(query: Optional[str], authorization: Optional[str]):
+    if not config.SINGLE_FLIGHT_ENABLED:
+        return await run_search(query)
+
+    search_deadline = deadline.current()
+    try:
+        data, partial = await searches.do(
+            search_key(query, authorization),
+            lambda: run_search(query),
+            timeout=search_deadline.wait_timeout(),
+        )
+    except deadline.DeadlineExceeded:
+        if search_deadline.expired:
+            raise
+        # The search ran out of the time of a caller with a shorter deadline
+        return await run_search(query)
+
+    if partial and not search_deadline.partial and not search_deadline.expired:
+        # Results cut short by the deadline of another caller sharing the
+        # search, which was shorter than this one: search again
+        return await run_search(query)
+    return data, partial
+
+
+def streaming_media_type(accept: Optional[str]) -> Optional[str]:
+    """
+    Returns the streaming media type the Accept header prefers over JSON, if any.
+
+    Args:
+        accept (Optional[str]): Accept header
+
+    Returns:
+        Optional[str]: application/x-ndjson, text/event-stream or None
+    """
+    preferred, preferred_quality = None, 0.0
+    for value in (accept or "").split(","):
+        media_type, *params = [part.strip() for part in value.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, param_value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(param_value)
+                except ValueError:
+                    quality = 0.0
+        if media_type in ("application/json", NDJSON_MEDIA_TYPE, SSE_MEDIA_TYPE):
+            if quality > preferred_quality:
+                preferred, preferred_quality = media_type, quality
+    return preferred if preferred != "application/json" else None
+
+
+def format_record(kind: str, data: dict, media_type: str) -> str:
+    if media_type == SSE_MEDIA_TYPE:
+        return f"event: {kind}\ndata: {json.dumps(data)}\n\n"
+    return json.dumps({kind: data}) + "\n"
+
+
+def stream_search(query: str, media_type: str) -> StreamingResponse:
+    """
+    Streams each result as soon as provider.iter_search yields it, as NDJSON
+    lines or server-sent events, followed by a summary with the number of
+    results, whether they are partial, any error and the timings. Streamed
+    searches aren't coalesced with identical searches in flight.
+
+    Args:
+        query (str): Query string
+        media_type (str): application/x-ndjson or text/event-stream
+
+    Returns:
+        StreamingResponse: Response streaming the results
+    """
+    search_deadline = deadline.current()
+    start = time.perf_counter()
+
+    async def records() -> AsyncIterator[str]:
+        # The body is streamed after the deadline middleware returns, so the
+        # deadline is set again for the threads iterating the search
+        deadline.current_deadline.set(search_deadline)
+        count, first_result_ms, errors = 0, None, []
+        try:
+            with tracing.span("provider.iter_search"):
+                results = iterate_in_threadpool(provider.iter_search(query))
+                async for result in results:
+                    if first_result_ms is None:
+                        first_result_ms = round((time.perf_counter() - start) * 1000)
+                    count += 1
+                    yield format_record(
+                        "result", result.model_dump(mode="json"), media_type
+                    )
+        except deadline.DeadlineExceeded:
+            search_deadline.mark_partial()
+        except UpstreamProviderError as error:
+            logger.error(f"upstream_search_error: {error.message}")
+            metrics.record_error(error)
+            errors.append(error.message)
+
+        logger.info(f"streamed_results: {count}")
+        metrics.record_search_results(count)
+        summary = {
+            "results": count,
+            "partial": search_deadline.partial,
+            "errors": errors,
+            "first_result_ms": first_result_ms,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000),
+        }
+        yield format_record("summary", summary, media_type)
+
+    return StreamingResponse(
+        records(),
+        media_type=media_type,
+        headers={
+            "X-Connector-ID": config.CONNECTOR_ID,
+            "Cache-Control": "no-cache",
+            # Stops proxies such as nginx from buffering the stream
+            "X-Accel-Buffering": "no",
+        },
+    )
+
 
 def authenticate(Authorization: str = Header(None)) -> None:
     """
@@ -33,34 +206,94 @@ def authenticate(Authorization: str = Header(None)) -> None:
     logger.debug("authenticate: (OK)")
 
 
-@app.post("/search", response_model=SearchResponse)
+@app.post("/search", response_model=SearchResponse, response_model_exclude_none=True)
 async def search(
     response: Response,
     request: Optional[SearchRequest] = None,
     user: None = Depends(authenticate),
+    Authorization: str = Header(None),
+    accept: str = Header(None),
 ):
     """
-    Search Endpoint
+    Search Endpoint. Results are streamed as NDJSON or server-sent events when
+    the Accept header prefers application/x-ndjson or text/event-stream.
 
     Args:
         request (Optional[Request], optional): Request object. Defaults to None.
         user (None, optional): User object. Defaults to Depends(authenticate).
+        Authorization (str, optional): Authorization header. Defaults to Header(None).
+        accept (str, optional): Accept header. Defaults to Header(None).
 
     Returns:
-        JSONResponse: Response object
+        JSONResponse: Response object, or StreamingResponse when streaming
     """
     response.headers["X-Connector-ID"] = config.CONNECTOR_ID
 
     if request is None:
         return SearchResponse(results=[])
 
+    if media_type := streaming_media_type(accept):
+        return stream_search(request.query, media_type)
+
     try:
-        data = provider.search(request.query)
+        data, partial = await coalesced_search(request.query, Authorization)
+    except deadline.DeadlineExceeded:
+        logger.warning("search_deadline_exceeded: no results found before the deadline")
+        data, partial = [], True
     except UpstreamProviderError as error:
         logger.error(f"upstream_search_error: {error.message}")
+        metrics.record_error(error)
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Error with search provider",
         )
 
-    return SearchResponse(results=data)
+    metrics.record_search_results(len(data))
+    return SearchResponse(results=data, partial=partial or None)
+
+
+@app.post(
+    "/search/batch",
+    response_model=SearchBatchResponse,
+    response_model_exclude_none=True,
+)
+async def search_batch(
+    response: Response,
+    request: SearchBatchRequest,
+    user: None = Depends(authenticate),
+    Authorization: str = Header(None),
+):
+    """
+    Batch Search Endpoint. The queries are searched concurrently, sharing the
+    deadline, clients and caches of the connector.
+
+    Args:
+        request (SearchBatchRequest): Request object
+        user (None, optional): User object. Defaults to Depends(authenticate).
+        Authorization (str, optional): Authorization header. Defaults to Header(None).
+
+    Returns:
+        JSONResponse: Response object with the results or error of each query
+    """
+    response.headers["X-Connector-ID"] = config.CONNECTOR_ID
+    batch_deadline = deadline.current()
+    semaphore = asyncio.Semaphore(config.BATCH_MAX_CONCURRENCY)
+
+    async def search_query(query: str) -> SearchBatchResult:
+        # Each query runs in its own task, with its own view of the deadline
+        deadline.current_deadline.set(batch_deadline.branch())
+        try:
+            async with semaphore:
+                data, partial = await coalesced_search(query, Authorization)
+        except deadline.DeadlineExceeded:
+            data, partial = [], True
+        except UpstreamProviderError as error:
+            logger.error(f"upstream_search_error: {query}: {error.message}")
+            metrics.record_error(error)
+            return SearchBatchResult(query=query, error="Error with search provider")
+
+        metrics.record_search_results(len(data))
+        return SearchBatchResult(query=query, results=data, partial=partial or None)
+
+    results = await asyncio.gather(*(search_query(q) for q in request.queries))
+    return SearchBatchResponse(results=results)
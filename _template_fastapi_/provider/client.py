@@ -2,6 +2,7 @@ import logging
 from typing import Dict, List
 
 from config import AppConfig
+from upstream import get_session
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +25,9 @@ class CustomClient:
         """
         self.headers = {"Authorization": f"Bearer {token}"}
         self.search_limit = search_limit
+        # Make HTTP calls with this session, so they are included in the connector
+        # metrics, e.g. self.session.get(url, headers=self.headers)
+        self.session = get_session()
 
     def search(self, query: str) -> List[Dict]:
         """
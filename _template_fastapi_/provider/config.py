@@ -1,3 +1,5 @@
+from typing import Dict, Optional
+
 from pydantic import Field
 from pydantic_settings import BaseSettings
 
@@ -11,6 +13,28 @@ class AppConfig(BaseSettings):
     CONNECTOR_API_KEY: str = Field(..., env="CONNECTOR_API_KEY")
     CLIENT_AUTH_TOKEN: str = Field(..., env="CLIENT_AUTH_TOKEN")
     CLIENT_SEARCH_LIMIT: int = Field(5, env="CLIENT_SEARCH_LIMIT")
+    METRICS_ENABLED: bool = Field(True, env="METRICS_ENABLED")
+    TRACING_EXPORTER: Optional[str] = Field(None, env="TRACING_EXPORTER")
+    TRACING_FILE: Optional[str] = Field(None, env="TRACING_FILE")
+    SINGLE_FLIGHT_ENABLED: bool = Field(True, env="SINGLE_FLIGHT_ENABLED")
+    DEADLINE_SECONDS: float = Field(30, env="DEADLINE_SECONDS")
+    RATE_LIMIT_ENABLED: bool = Field(True, env="RATE_LIMIT_ENABLED")
+    RATE_LIMIT_REDIS_URL: Optional[str] = Field(None, env="RATE_LIMIT_REDIS_URL")
+    RATE_LIMITS: Dict[str, float] = Field({}, env="RATE_LIMITS")
+    RATE_LIMIT_PER_SECOND: Optional[float] = Field(None, env="RATE_LIMIT_PER_SECOND")
+    RATE_LIMIT_BURST: Optional[int] = Field(None, env="RATE_LIMIT_BURST")
+    RATE_LIMIT_MAX_WAIT_SECONDS: float = Field(5, env="RATE_LIMIT_MAX_WAIT_SECONDS")
+    CIRCUIT_BREAKER_ENABLED: bool = Field(True, env="CIRCUIT_BREAKER_ENABLED")
+    CIRCUIT_BREAKER_FAILURES: int = Field(5, env="CIRCUIT_BREAKER_FAILURES")
+    CIRCUIT_BREAKER_RESET_SECONDS: float = Field(
+        30, env="CIRCUIT_BREAKER_RESET_SECONDS"
+    )
+    CIRCUIT_BREAKER_LATENCY_SECONDS: Optional[float] = Field(
+        None, env="CIRCUIT_BREAKER_LATENCY_SECONDS"
+    )
+    HEDGING_ENABLED: bool = Field(False, env="HEDGING_ENABLED")
+    HEDGING_MAX_WORKERS: int = Field(32, env="HEDGING_MAX_WORKERS")
+    BATCH_MAX_CONCURRENCY: int = Field(8, env="BATCH_MAX_CONCURRENCY")
 
     class Config:
         """
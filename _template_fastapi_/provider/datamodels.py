@@ -4,7 +4,7 @@ See https://docs.cohere.com/docs/connectors
 """
 
 from datetime import datetime
-from pydantic import BaseModel, HttpUrl
+from pydantic import BaseModel, Field, HttpUrl
 from typing import List, Optional
 
 
@@ -43,9 +43,39 @@ class SearchRequest(BaseModel):
 
 class SearchResponse(BaseModel):
     """
-    The Connector should return a list of DataItems.
+    The Connector should return a list of DataItems. partial is only set, to
+    true, when the search deadline was reached before every upstream call
+    completed.
 
     See https://docs.cohere.com/docs/creating-and-deploying-a-connector
     """
 
     results: List[DataItem]
+    partial: Optional[bool] = None
+
+
+class SearchBatchRequest(BaseModel):
+    """
+    The batch search endpoint accepts several queries, searched concurrently.
+    """
+
+    queries: List[str] = Field(..., min_length=1, max_length=32)
+
+
+class SearchBatchResult(BaseModel):
+    """
+    Results of one query of a batch, or the error of its search.
+    """
+
+    query: str
+    results: List[DataItem] = []
+    error: Optional[str] = None
+    partial: Optional[bool] = None
+
+
+class SearchBatchResponse(BaseModel):
+    """
+    The results of each query of a batch, in the order of the queries.
+    """
+
+    results: List[SearchBatchResult]
@@ -0,0 +1,191 @@
+"""
+Per-request deadline, the time budget of a search
+"""
+
+import contextvars
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed, wait
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+from fastapi import FastAPI, Request, Response
+
+DEADLINE_HEADER = "X-Deadline-Seconds"
+
+current_deadline = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """
+    Exception raised when the search deadline is reached.
+    """
+
+
+class Deadline:
+    """
+    Time budget of a search. Every upstream call gets the remaining time as its
+    timeout, and results that completed in time are returned marked as partial
+    rather than failing the whole search when the budget runs out.
+    """
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+        self.partial = False
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def wait_timeout(self) -> Optional[float]:
+        # Timeout for waiting on futures or events, None when there is no deadline
+        remaining = self.remaining()
+        return None if math.isinf(remaining) else remaining
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() == 0
+
+    def timeout(
+        self,
+        timeout: Union[None, float, Tuple[Optional[float], Optional[float]]] = None,
+    ):
+        """
+        Timeout for a requests call, capped to the remaining time.
+
+        Args:
+            timeout: Timeout as a number or a (connect, read) tuple. Defaults to None.
+
+        Returns:
+            Capped timeout
+        """
+        if (remaining := self.remaining()) == 0:
+            raise DeadlineExceeded()
+
+        if math.isinf(remaining):
+            return timeout
+        if timeout is None:
+            return remaining
+        if isinstance(timeout, tuple):
+            return tuple(remaining if t is None else min(t, remaining) for t in timeout)
+        return min(timeout, remaining)
+
+    def branch(self) -> "Deadline":
+        """
+        Deadline with the same expiry but its own partial flag, for one of the
+        searches of a batch.
+        """
+        branch = Deadline(0)
+        branch.expires_at = self.expires_at
+        return branch
+
+    def mark_partial(self) -> None:
+        self.partial = True
+
+
+def current() -> Deadline:
+    # Outside of a request, e.g. in a shell, there is no deadline
+    return current_deadline.get() or Deadline(float("inf"))
+
+
+def fan_out(function: Callable, items: Iterable, max_workers: int = 10) -> List:
+    """
+    Fans function out over items in threads and returns the results completed
+    before the deadline, in the order of items. The search is marked as partial
+    when some are dropped.
+
+    Args:
+        function (Callable): Function called with each item
+        items (Iterable): Items
+        max_workers (int, optional): Number of threads. Defaults to 10.
+
+    Returns:
+        List: Results completed before the deadline
+    """
+    deadline = current()
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = [
+        # Each call runs in a copy of the caller's context, so it sees the deadline
+        executor.submit(contextvars.copy_context().run, function, item)
+        for item in items
+    ]
+    done, not_done = wait(futures, timeout=deadline.wait_timeout())
+    # Calls still running are left to time out in the background, since their
+    # upstream timeouts are capped to the deadline too
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    if not_done:
+        deadline.mark_partial()
+
+    results = []
+    for future in futures:
+        if future not in done:
+            continue
+        if isinstance(error := future.exception(), DeadlineExceeded):
+            deadline.mark_partial()
+        elif error is not None:
+            raise error
+        else:
+            results.append(future.result())
+
+    return results
+
+
+def fan_out_as_completed(
+    function: Callable, items: Iterable, max_workers: int = 10
+) -> Iterator:
+    """
+    Like fan_out, but yields the results as they complete, for streaming.
+
+    Args:
+        function (Callable): Function called with each item
+        items (Iterable): Items
+        max_workers (int, optional): Number of threads. Defaults to 10.
+
+    Yields:
+        Results completed before the deadline
+    """
+    deadline = current()
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = [
+        executor.submit(contextvars.copy_context().run, function, item)
+        for item in items
+    ]
+    try:
+        for future in as_completed(futures, timeout=deadline.wait_timeout()):
+            if isinstance(error := future.exception(), DeadlineExceeded):
+                deadline.mark_partial()
+            elif error is not None:
+                raise error
+            else:
+                yield future.result()
+    except TimeoutError:
+        deadline.mark_partial()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def init_app(app: FastAPI, seconds: float) -> None:
+    """
+    Give every request a deadline of seconds, or of the number of seconds in
+    the X-Deadline-Seconds header when that is shorter.
+
+    Args:
+        app (FastAPI): Application
+        seconds (float): Deadline of each request
+    """
+
+    async def start_deadline(request: Request, call_next) -> Response:
+        budget = seconds
+        if header := request.headers.get(DEADLINE_HEADER):
+            try:
+                # Callers can only shorten the configured deadline
+                budget = min(budget, float(header))
+            except ValueError:
+                pass
+
+        token = current_deadline.set(Deadline(budget))
+        try:
+            return await call_next(request)
+        finally:
+            current_deadline.reset(token)
+
+    app.middleware("http")(start_deadline)
@@ -0,0 +1,126 @@
+"""
+Prometheus metrics for the connector
+"""
+
+import os
+import time
+
+from fastapi import FastAPI, Request, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+REQUEST_SECONDS = Histogram(
+    "connector_request_seconds",
+    "Time spent handling connector requests",
+    ["endpoint", "method", "status"],
+)
+UPSTREAM_REQUEST_SECONDS = Histogram(
+    "connector_upstream_request_seconds",
+    "Time spent in calls to upstream services, by host and endpoint",
+    ["host", "endpoint", "status"],
+)
+SEARCH_RESULTS = Histogram(
+    "connector_search_results",
+    "Number of results returned by a search",
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200),
+)
+RESPONSE_BYTES = Histogram(
+    "connector_response_bytes",
+    "Size of connector response payloads",
+    ["endpoint"],
+    buckets=(1e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6, 1e7),
+)
+CACHE_LOOKUPS = Counter(
+    "connector_cache_lookups_total",
+    "Cache lookups, the hit ratio is hits divided by all lookups",
+    ["cache", "result"],
+)
+HEDGED_REQUESTS = Counter(
+    "connector_hedged_requests_total",
+    "Upstream calls that were hedged, by host and by the call that answered first",
+    ["host", "winner"],
+)
+ERRORS = Counter(
+    "connector_errors_total",
+    "Errors raised while handling connector requests, by class",
+    ["error_class"],
+)
+
+
+def record_upstream_request(host: str, endpoint: str, status, seconds: float) -> None:
+    UPSTREAM_REQUEST_SECONDS.labels(host, endpoint, str(status)).observe(seconds)
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def record_hedged_request(host: str, winner: str) -> None:
+    HEDGED_REQUESTS.labels(host, winner).inc()
+
+
+def record_error(error: Exception) -> None:
+    ERRORS.labels(type(error).__name__).inc()
+
+
+def record_search_results(count: int) -> None:
+    SEARCH_RESULTS.observe(count)
+
+
+async def observe_request(request: Request, call_next) -> Response:
+    """
+    HTTP middleware timing every request, by route.
+    """
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except Exception as error:
+        record_error(error)
+        raise
+
+    route = request.scope.get("route")
+    endpoint = route.path if route else "unmatched"
+    REQUEST_SECONDS.labels(endpoint, request.method, str(response.status_code)).observe(
+        time.perf_counter() - start
+    )
+    if content_length := response.headers.get("content-length"):
+        RESPONSE_BYTES.labels(endpoint).observe(int(content_length))
+
+    return response
+
+
+def metrics_endpoint() -> Response:
+    """
+    Metrics Endpoint, in the Prometheus text format
+    """
+    # With several workers, each worker writes its metrics to
+    # PROMETHEUS_MULTIPROC_DIR and they are aggregated here
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+def init_app(app: FastAPI, enabled: bool = True) -> None:
+    """
+    Time every request and expose the collected metrics on /metrics.
+
+    Args:
+        app (FastAPI): Application to instrument
+        enabled (bool, optional): Whether metrics are collected. Defaults to True.
+    """
+    if not enabled:
+        return
+
+    app.middleware("http")(observe_request)
+    app.add_api_route("/metrics", metrics_endpoint, methods=["GET"])
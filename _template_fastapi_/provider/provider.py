@@ -1,9 +1,11 @@
 import logging
-from typing import List
+from typing import Iterator, List
 
 from pydantic import ValidationError
 
+import tracing
 from client import get_client
+from deadline import DeadlineExceeded
 from datamodels import DataItem
 from exceptions import UpstreamProviderError
 
@@ -25,12 +27,15 @@ def search(query: str) -> List[DataItem]:
 
     try:
         data = client.search(query=query)
+    except DeadlineExceeded:
+        raise
     except Exception as error:
         logger.error(f"search_error: {error}")
         raise UpstreamProviderError("Error retrieving data from the search") from error
 
     try:
-        data_items = [DataItem(**d) for d in data]
+        with tracing.span("serialize", results=len(data)):
+            data_items = [DataItem(**d) for d in data]
     except ValidationError as error:
         logger.error(f"Data validation error: {error}")
         raise UpstreamProviderError(
@@ -38,3 +43,19 @@ def search(query: str) -> List[DataItem]:
         ) from error
 
     return data_items
+
+
+def iter_search(query: str) -> Iterator[DataItem]:
+    """
+    Streaming variant of search, used when the caller asks for a streamed
+    response. It should yield each DataItem as soon as it is ready.
+    Connectors fetching results with several upstream calls can yield from
+    deadline.fan_out_as_completed(), so a slow call doesn't hold back the others.
+
+    Args:
+        query (str): Query string
+
+    Yields:
+        DataItem: Each data item resulting from the search.
+    """
+    yield from search(query)
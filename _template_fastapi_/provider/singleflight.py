@@ -0,0 +1,75 @@
+"""
+Coalescing of concurrent identical searches
+"""
+
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+import metrics
+from deadline import DeadlineExceeded
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller runs the
+    coroutine, and callers arriving while it is in flight await it and share
+    its result, or its exception, for up to timeout seconds. Nothing is cached
+    once the call completes.
+    """
+
+    def __init__(self):
+        self.calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(
+        self,
+        key: Hashable,
+        function: Callable[[], Awaitable[Any]],
+        timeout: Optional[float] = None,
+    ) -> Any:
+        """
+        Run function, unless a call with the same key is already in flight.
+
+        Args:
+            key (Hashable): Key identifying identical calls
+            function (Callable[[], Awaitable[Any]]): Coroutine function to run
+            timeout (Optional[float], optional): Time to wait for a call in flight.
+                Defaults to None.
+
+        Returns:
+            Any: Result of the call
+        """
+        if (call := self.calls.get(key)) is not None:
+            metrics.record_cache_lookup("singleflight", True)
+            try:
+                # shield, so a follower timing out doesn't cancel the shared call
+                return await asyncio.wait_for(asyncio.shield(call), timeout)
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded()
+
+        metrics.record_cache_lookup("singleflight", False)
+        call = self.calls[key] = asyncio.ensure_future(function())
+        try:
+            return await asyncio.shield(call)
+        finally:
+            if call.done():
+                del self.calls[key]
+            else:
+                call.add_done_callback(lambda _: self.calls.pop(key, None))
+
+
+def search_key(query: Optional[str], authorization: Optional[str]) -> Tuple[str, str]:
+    """
+    Searches are shared by callers with the same credentials only, since
+    connectors using per-user OAuth tokens return different results per user.
+    Queries differing only in whitespace are the same search.
+
+    Args:
+        query (Optional[str]): Query string
+        authorization (Optional[str]): Authorization header
+
+    Returns:
+        Tuple[str, str]: Normalized query and hashed principal
+    """
+    principal = hashlib.sha256((authorization or "").encode()).hexdigest()
+    return " ".join((query or "").split()), principal
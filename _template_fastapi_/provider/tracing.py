@@ -0,0 +1,167 @@
+"""
+Optional OpenTelemetry tracing for the connector
+"""
+
+import contextlib
+import functools
+from typing import Callable, Optional
+
+from fastapi import FastAPI, Request, Response
+
+try:
+    from opentelemetry import context, propagate, trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+except ImportError:
+    trace = None
+
+tracer = None
+
+
+def get_exporter(exporter: str, file: Optional[str]):
+    """
+    Create the span exporter.
+
+    Args:
+        exporter (str): otlp to send spans to a collector, file to append them to a file
+        file (Optional[str]): Path of the file spans are appended to
+
+    Returns:
+        SpanExporter: Span exporter
+    """
+    if exporter == "otlp":
+        # The collector endpoint is read from OTEL_EXPORTER_OTLP_ENDPOINT,
+        # http://localhost:4318 by default
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+            OTLPSpanExporter,
+        )
+
+        return OTLPSpanExporter()
+
+    if exporter == "file":
+        assert file, "TRACING_FILE must be set when TRACING_EXPORTER is file"
+        # One JSON document per finished span
+        return ConsoleSpanExporter(
+            out=open(file, "a"),
+            formatter=lambda span: span.to_json(indent=None) + "\n",
+        )
+
+    raise AssertionError("TRACING_EXPORTER must be either otlp or file")
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes):
+    """
+    Trace the enclosed block as a child of the current span, for instance around
+    an upstream call, a database query or a document parse. Does nothing when
+    tracing is disabled.
+
+    Args:
+        name (str): Span name
+        **attributes: Span attributes
+    """
+    if tracer is None:
+        yield None
+        return
+
+    with tracer.start_as_current_span(name, attributes=attributes) as current:
+        yield current
+
+
+def start_span(name: str, **attributes):
+    # For spans that can't wrap a block, such as in callbacks. The caller ends them
+    if tracer is None:
+        return None
+
+    return tracer.start_span(name, attributes=attributes)
+
+
+def end_span(current, error: Optional[BaseException] = None) -> None:
+    if current is None:
+        return
+
+    if error is not None:
+        current.record_exception(error)
+        current.set_status(trace.Status(trace.StatusCode.ERROR))
+    current.end()
+
+
+def with_context(function: Callable) -> Callable:
+    """
+    Run function in the trace context of the caller, so spans created from a
+    ThreadPoolExecutor used to fan out a search stay in the same trace.
+
+    Args:
+        function (Callable): Function to run in another thread
+
+    Returns:
+        Callable: Wrapped function
+    """
+    if tracer is None:
+        return function
+
+    parent = context.get_current()
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        token = context.attach(parent)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            context.detach(token)
+
+    return wrapper
+
+
+def inject(headers) -> None:
+    # Propagate the current trace to the upstream service in the traceparent header
+    if tracer is not None:
+        propagate.inject(headers)
+
+
+async def trace_request(request: Request, call_next) -> Response:
+    """
+    HTTP middleware tracing every request, continuing the caller's trace if any.
+    """
+    with tracer.start_as_current_span(
+        f"{request.method} {request.url.path}",
+        context=propagate.extract(request.headers),
+        kind=trace.SpanKind.SERVER,
+        attributes={"http.request.method": request.method},
+    ) as current:
+        response = await call_next(request)
+        if route := request.scope.get("route"):
+            current.update_name(f"{request.method} {route.path}")
+            current.set_attribute("http.route", route.path)
+        current.set_attribute("http.response.status_code", response.status_code)
+        return response
+
+
+def init_app(
+    app: FastAPI, service_name: str, exporter: Optional[str], file: Optional[str]
+) -> None:
+    """
+    Trace requests with OpenTelemetry when an exporter is configured.
+
+    Args:
+        app (FastAPI): Application to instrument
+        service_name (str): Service name reported with the spans
+        exporter (Optional[str]): otlp or file, tracing is disabled when not set
+        file (Optional[str]): Path of the file spans are appended to
+    """
+    global tracer
+
+    if not exporter:
+        return
+
+    assert (
+        trace is not None
+    ), "TRACING_EXPORTER requires the tracing extra: poetry install --extras tracing"
+
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(get_exporter(exporter, file)))
+    trace.set_tracer_provider(provider)
+    tracer = provider.get_tracer(__name__)
+
+    app.middleware("http")(trace_request)
@@ -0,0 +1,218 @@
+import asyncio
+import re
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+import circuitbreaker
+import deadline
+import hedging
+import metrics
+import ratelimit
+import tracing
+
+# Path segments that identify a resource, such as numeric ids, UUIDs or long
+# opaque keys, are replaced so metrics are grouped by endpoint
+ID_SEGMENT = re.compile(r"\d+|[0-9a-fA-F-]{16,}|[\w-]{32,}")
+
+session = None
+
+
+def get_endpoint(path):
+    return "/".join(
+        "{id}" if ID_SEGMENT.fullmatch(segment) else segment
+        for segment in path.split("/")
+    )
+
+
+class UpstreamSession(requests.Session):
+    """
+    requests.Session used for every call to the upstream service. It records
+    the latency and status of each call, by host and endpoint, and traces it.
+    Calls are rate limited, and time out when the search deadline is reached.
+    Calls to failing hosts are stopped by a circuit breaker, and idempotent
+    calls can be hedged.
+    """
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        with tracing.span(
+            f"{request.method} {url.hostname}",
+            **{
+                "http.request.method": request.method,
+                "server.address": url.hostname,
+                "url.path": get_endpoint(url.path),
+            },
+        ) as span:
+            tracing.inject(request.headers)
+            key = ratelimit.bucket_key(
+                url.hostname, request.headers.get("Authorization")
+            )
+            search_deadline = deadline.current()
+            timeout = kwargs.pop("timeout", None)
+
+            def attempt(request, hedge=False):
+                return self._attempt(
+                    request, url, key, search_deadline, timeout, hedge, **kwargs
+                )
+
+            if hedging.hedger is not None:
+                response = hedging.hedger.send(attempt, request, url.hostname)
+            else:
+                response = attempt(request)
+
+            if ratelimit.limiter is not None and response.status_code == 429:
+                response = self._retry_rate_limited(attempt, request, response)
+
+            if span is not None:
+                span.set_attribute("http.response.status_code", response.status_code)
+            return response
+
+    def _retry_rate_limited(self, attempt, request, response):
+        # Wait for the rate limit to reset and try once more, if that's soon enough
+        try:
+            retried = attempt(request)
+        except ratelimit.RateLimitExceeded:
+            return response
+
+        response.close()
+        return retried
+
+    def _attempt(self, request, url, key, search_deadline, timeout, hedge, **kwargs):
+        # A single call to the upstream host, through its circuit breaker and rate limit
+        endpoint = get_endpoint(url.path)
+        limiter = ratelimit.limiter
+        breaker = None
+        if circuitbreaker.breakers is not None:
+            breaker = circuitbreaker.breakers.get(url.hostname)
+
+        probe = False
+        try:
+            if breaker is not None:
+                try:
+                    probe = breaker.before_call()
+                except circuitbreaker.CircuitOpen as error:
+                    metrics.record_upstream_request(
+                        url.hostname, endpoint, type(error).__name__, 0
+                    )
+                    raise
+            if limiter is not None:
+                # A hedge isn't worth waiting for, as the first call is still running
+                limiter.acquire(
+                    key,
+                    url.hostname,
+                    max_wait=0 if hedge else search_deadline.remaining(),
+                )
+            kwargs["timeout"] = search_deadline.timeout(timeout)
+
+            start = time.perf_counter()
+            try:
+                response = super().send(request, **kwargs)
+            except requests.RequestException as error:
+                metrics.record_upstream_request(
+                    url.hostname,
+                    endpoint,
+                    type(error).__name__,
+                    time.perf_counter() - start,
+                )
+                timed_out = isinstance(error, requests.Timeout)
+                # Running out of search time says nothing about the host
+                cut_short = timed_out and (
+                    kwargs["timeout"] != timeout or search_deadline.expired
+                )
+                if breaker is not None and not cut_short:
+                    breaker.record(False)
+                    probe = False
+                if timed_out and search_deadline.expired:
+                    raise deadline.DeadlineExceeded() from error
+                raise
+
+            elapsed = time.perf_counter() - start
+            metrics.record_upstream_request(
+                url.hostname, endpoint, response.status_code, elapsed
+            )
+            if breaker is not None:
+                breaker.record_response(response, elapsed)
+                probe = False
+            if limiter is not None:
+                limiter.observe(key, response)
+            if hedging.hedger is not None:
+                hedging.hedger.record_latency(url.hostname, elapsed)
+            return response
+        finally:
+            # A probe that ended without an outcome lets the next call probe instead
+            if probe:
+                breaker.release()
+
+
+def get_session():
+    # A single session keeps connections to the upstream service alive between searches
+    global session
+    if session is None:
+        session = UpstreamSession()
+
+    return session
+
+
+def trace_config():
+    """
+    aiohttp TraceConfig recording the same upstream metrics and spans, and applying
+    the same rate limits, as UpstreamSession for clients that use aiohttp. Pass it
+    to the session:
+
+        aiohttp.ClientSession(trace_configs=[upstream.trace_config()])
+    """
+    import aiohttp
+
+    async def on_request_start(session, context, params):
+        context.span, context.start = None, time.perf_counter()
+        context.key = ratelimit.bucket_key(
+            params.url.host, params.headers.get("Authorization")
+        )
+        if ratelimit.limiter is not None:
+            wait = ratelimit.limiter.reserve(
+                context.key, params.url.host, deadline.current().remaining()
+            )
+            await asyncio.sleep(wait)
+
+        context.span = tracing.start_span(
+            f"{params.method} {params.url.host}",
+            **{
+                "http.request.method": params.method,
+                "server.address": params.url.host,
+                "url.path": get_endpoint(params.url.path),
+            },
+        )
+        tracing.inject(params.headers)
+        context.start = time.perf_counter()
+
+    async def on_request_end(session, context, params):
+        if ratelimit.limiter is not None:
+            ratelimit.limiter.observe(context.key, params.response)
+        metrics.record_upstream_request(
+            params.url.host,
+            get_endpoint(params.url.path),
+            params.response.status,
+            time.perf_counter() - context.start,
+        )
+        if context.span is not None:
+            context.span.set_attribute(
+                "http.response.status_code", params.response.status
+            )
+        tracing.end_span(context.span)
+
+    async def on_request_exception(session, context, params):
+        metrics.record_upstream_request(
+            params.url.host,
+            get_endpoint(params.url.path),
+            type(params.exception).__name__,
+            time.perf_counter() - context.start,
+        )
+        tracing.end_span(context.span, params.exception)
+
+    config = aiohttp.TraceConfig()
+    config.on_request_start.append(on_request_start)
+    config.on_request_end.append(on_request_end)
+    config.on_request_exception.append(on_request_exception)
+    return config
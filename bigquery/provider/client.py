@@ -4,12 +4,18 @@ from . import UpstreamProviderError
 
 CREDENTIALS_FILE_PATH = "./credentials.json"
 
+client = None
+
 
 def get_client():
     """
     Google BigQuery API client requires user to authenticate with a
     service account's credentials. Make sure to see the README for details.
+    The client is created once and shared by every request in the process.
     """
+    global client
+    if client is not None:
+        return client
 
     assert os.path.exists(
         CREDENTIALS_FILE_PATH
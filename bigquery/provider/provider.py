@@ -1,8 +1,16 @@
 import logging
 
 import os
+import re
 from typing import Any
 
+from google.cloud import bigquery
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
 from .client import get_client
 
 from . import UpstreamProviderError
@@ -12,45 +20,84 @@ logger = logging.getLogger(__name__)
 
 BIGQUERY_TABLE_NAME = os.environ.get("BIGQUERY_TABLE_NAME")
 BIGQUERY_COLUMN_NAME = os.environ.get("BIGQUERY_COLUMN_NAME")
+BIGQUERY_SEARCH_MODE = os.environ.get("BIGQUERY_SEARCH_MODE") or "regex"
+BIGQUERY_SELECT_COLUMNS = os.environ.get("BIGQUERY_SELECT_COLUMNS") or "*"
+BIGQUERY_SEARCH_LIMIT = int(os.environ.get("BIGQUERY_SEARCH_LIMIT") or 100)
+BIGQUERY_MAXIMUM_BYTES_BILLED = os.environ.get("BIGQUERY_MAXIMUM_BYTES_BILLED")
+
+REGEX_SEARCH_MODE = "regex"
+SEARCH_INDEX_MODE = "search_index"
 
 """
-Explanation: BigQuery SQL's most search-like feature is REGEXP_CONTAINS.
-This method builds the regex to support it.
+Explanation: Without a search index, BigQuery SQL's most search-like feature is
+REGEXP_CONTAINS. This method builds the regex to support it.
 
 (?i):       enables case-insensitive matching
 .*<term>.*: enables partial matching
 |:          enables multiple terms
+
+With a search index on the column, the SEARCH() function is used instead so
+BigQuery can prune the data it reads, and bill for, using the index.
 """
 
 
 def build_regex(query) -> str:
     # Assumes query delimiter is whitespace
-    search_terms = query.split(" ")
+    search_terms = [re.escape(term) for term in query.split()]
     separator = ".*|.*"
 
     return f"(?i).*{separator.join(search_terms)}.*"
 
 
-def search(query) -> list[dict[str, Any]]:
-    client = get_client()
+def build_query() -> str:
+    if BIGQUERY_SEARCH_MODE == SEARCH_INDEX_MODE:
+        condition = f"SEARCH({BIGQUERY_COLUMN_NAME}, @query)"
+    else:
+        condition = f"REGEXP_CONTAINS({BIGQUERY_COLUMN_NAME}, @query)"
 
-    regex = build_regex(query)
-
-    QUERY = f"""
-        SELECT * from {BIGQUERY_TABLE_NAME}
-        WHERE REGEXP_CONTAINS({BIGQUERY_COLUMN_NAME}, r'{regex}');
+    return f"""
+        SELECT {BIGQUERY_SELECT_COLUMNS} from {BIGQUERY_TABLE_NAME}
+        WHERE {condition}
+        LIMIT @limit;
     """
 
+
+def build_job_config(query) -> bigquery.QueryJobConfig:
+    search_query = (
+        query if BIGQUERY_SEARCH_MODE == SEARCH_INDEX_MODE else build_regex(query)
+    )
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter("query", "STRING", search_query),
+            bigquery.ScalarQueryParameter("limit", "INT64", BIGQUERY_SEARCH_LIMIT),
+        ]
+    )
+    if BIGQUERY_MAXIMUM_BYTES_BILLED:
+        job_config.maximum_bytes_billed = int(BIGQUERY_MAXIMUM_BYTES_BILLED)
+
+    return job_config
+
+
+def search(query) -> list[dict[str, Any]]:
+    assert BIGQUERY_SEARCH_MODE in [
+        REGEX_SEARCH_MODE,
+        SEARCH_INDEX_MODE,
+    ], 'BIGQUERY_SEARCH_MODE must be "regex" or "search_index"'
+
+    client = get_client()
+
     try:
         # API request, returns async job
-        query_job = client.query(QUERY)
+        query_job = client.query(build_query(), job_config=build_job_config(query))
         # Wait for async job completion
         rows = query_job.result()
+        if pyarrow is not None:
+            # Read the rows as Arrow through the BigQuery Storage Read API
+            records = rows.to_arrow(create_bqstorage_client=True).to_pylist()
+        else:
+            records = [dict(row) for row in rows]
     except Exception as e:
         message = f"Encountered exception: `{str(e)}` during BigQuery query."
         raise UpstreamProviderError(message)
 
-    # Convert response to array of dictionaries
-    records = [dict(row) for row in rows]
-
     return records
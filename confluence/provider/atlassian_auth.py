@@ -0,0 +1,48 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+ACCESSIBLE_RESOURCES_URL = "https://api.atlassian.com/oauth/token/accessible-resources"
+
+# Atlassian OAuth access tokens are valid for an hour
+DEFAULT_TTL_SECONDS = 60 * 60
+DEFAULT_MAX_SIZE = 1000
+
+
+class TokenCache:
+    """
+    Bounded, expiring cache of per-token state such as the cloud id a token can
+    access. Entries are keyed by a hash of the token, so raw access tokens are
+    not kept in memory, and the least recently used entries are evicted first.
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token):
+        key = self._key(token)
+        with self.lock:
+            if (entry := self.entries.get(key)) is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def put(self, token, value):
+        key = self._key(token)
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
@@ -4,13 +4,15 @@ import base64
 import functools
 import logging
 import re
-import requests
 import sys
+import threading
 
 from collections import OrderedDict
 from flask import current_app as app
 
 from . import UpstreamProviderError
+from .atlassian_auth import ACCESSIBLE_RESOURCES_URL, TokenCache
+from .storage import storage_to_text
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +23,8 @@ class BaseConfluenceClient:
     # Page consts
     PAGE_TYPE = "type"
     PAGE_BODY_FORMAT = "storage"
+    # Body formats that can be expanded directly in the CQL search results
+    EXPAND_BODY_FORMATS = ["storage", "view"]
 
     # Timeout for async requests
     TIMEOUT_SECONDS = 20
@@ -28,11 +32,14 @@ class BaseConfluenceClient:
     # Cache size limit to reduce memory over time
     CACHE_LIMIT_BYTES = 20 * 1024 * 1024  # 20 MB to bytes
 
-    def __init__(self, search_limit=10):
+    def __init__(self, search_limit=10, expand_body_format=None):
         self.search_limit = search_limit
+        self.expand_body_format = expand_body_format
         # Manually cache because functools.lru_cache does not support async methods
         self.cache = OrderedDict()
         self.loop = None
+        self.session = None
+        self.session_lock = threading.Lock()
 
     def _cache_size(self):
         # Calculate the total size of values in bytes
@@ -53,20 +60,30 @@ class BaseConfluenceClient:
         while self._cache_size() > self.CACHE_LIMIT_BYTES:
             self.cache.popitem()
 
-    def _start_session(self):
-        self.loop = asyncio.new_event_loop()
+    async def _create_session(self):
         # Create ClientTimeout object to apply timeout for every request in the session
         client_timeout = aiohttp.ClientTimeout(total=self.TIMEOUT_SECONDS)
-        self.session = aiohttp.ClientSession(loop=self.loop, timeout=client_timeout)
-
-    async def _close_session(self):
-        await self.session.close()
+        return aiohttp.ClientSession(timeout=client_timeout)
 
-    def _close_session_and_loop(self):
-        # Close session and loop, session closing must be done in an async method
-        self.loop.run_until_complete(self._close_session())
-        self.loop.stop()
-        self.loop.close()
+    def _start_session(self):
+        # A single loop, running in a background thread, serves every search for the
+        # life of the client so connections to Confluence are kept alive and reused
+        with self.session_lock:
+            if self.loop is not None:
+                return
+            self.loop = asyncio.new_event_loop()
+            threading.Thread(target=self.loop.run_forever, daemon=True).start()
+            self.session = self._run(self._create_session())
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def _serialize_page(self, content, base_url, body_format):
+        return {
+            "title": content["title"],
+            "text": storage_to_text(content["body"][body_format]["value"]),
+            "url": f"{base_url}/wiki{content['_links']['webui']}",
+        }
 
     async def _gather(self, pages, access_token=None):
         tasks = [
@@ -82,7 +99,7 @@ class BaseConfluenceClient:
         if page_id in self.cache:
             return self._cache_get(page_id)
 
-        base_url = self._get_base_url(access_token)
+        base_url = await self._get_base_url(access_token)
         get_page_by_id_url = f"{base_url}/wiki/api/v2/pages/{page_id}"
         params = {"body-format": self.PAGE_BODY_FORMAT}
 
@@ -92,26 +109,20 @@ class BaseConfluenceClient:
             params=params,
         ) as response:
             if not response.ok:
-                logger.error(f"Error response from Confluence: {response.text}")
+                logger.error(f"Error response from Confluence: {await response.text()}")
                 return None
 
             content = await response.json()
-
-            base_url = self._get_base_url(access_token)
-            page_url = f"{base_url}/wiki{content['_links']['webui']}"
-
-            serialized_page = {
-                "title": content["title"],
-                "text": content["body"][self.PAGE_BODY_FORMAT]["value"],
-                "url": page_url,
-            }
+            serialized_page = self._serialize_page(
+                content, base_url, self.PAGE_BODY_FORMAT
+            )
 
             # Update cache
             self._cache_put(page_id, serialized_page)
             return self._cache_get(page_id)
 
-    def search_pages(self, query, access_token=None):
-        base_url = self._get_base_url(access_token)
+    async def search_pages(self, query, access_token=None):
+        base_url = await self._get_base_url(access_token)
         search_url = f"{base_url}/wiki/rest/api/content/search"
 
         # Substitutes any sequence of non-alphanumeric or whitespace characters with a whitespace
@@ -121,49 +132,63 @@ class BaseConfluenceClient:
             "cql": f'text ~ "{formatted_query}"',
             "limit": self.search_limit,
         }
+        if self.expand_body_format:
+            params["expand"] = f"body.{self.expand_body_format}"
 
-        response = requests.get(
+        async with self.session.get(
             search_url,
             headers=self._get_headers(access_token),
             params=params,
-        )
+        ) as response:
+            if response.status != 200:
+                raise UpstreamProviderError(
+                    f"Error during Confluence search: {await response.text()}"
+                )
 
-        if response.status_code != 200:
-            raise UpstreamProviderError(
-                f"Error during Confluence search: {response.text}"
-            )
+            content = await response.json()
 
-        return response.json().get("results", [])
+        return content.get("results", [])
 
-    def fetch_pages(self, pages, access_token: str | None = None):
-        self._start_session()
-        results = self.loop.run_until_complete(self._gather(pages, access_token))
-        self._close_session_and_loop()
+    async def _search(self, query, access_token=None):
+        pages = await self.search_pages(query, access_token)
 
-        return results
-
-    def search(self, query, access_token=None):
-        pages = self.search_pages(query, access_token)
+        if self.expand_body_format:
+            # Bodies were expanded in the search results, no page fetches needed
+            base_url = await self._get_base_url(access_token)
+            return [
+                self._serialize_page(page, base_url, self.expand_body_format)
+                for page in pages
+                if self.PAGE_TYPE in page
+            ]
 
         return [
-            page for page in self.fetch_pages(pages, access_token) if page is not None
+            page for page in await self._gather(pages, access_token) if page is not None
         ]
 
+    def search(self, query, access_token=None):
+        self._start_session()
+
+        return self._run(self._search(query, access_token))
+
     def _get_headers(self, access_token: str | None = None) -> dict[str, str]:
         raise NotImplementedError()
 
-    def _get_base_url(self, access_token: str | None = None):
+    async def _get_base_url(self, access_token: str | None = None):
         raise NotImplementedError()
 
 
 class ServiceAuthConfluenceClient(BaseConfluenceClient):
-    def __init__(self, product_url, user, api_token, search_limit):
+    def __init__(
+        self, product_url, user, api_token, search_limit, expand_body_format=None
+    ):
         self.product_url = product_url
         self.user = user
         self.api_token = api_token
-        super().__init__(search_limit=search_limit)
+        super().__init__(
+            search_limit=search_limit, expand_body_format=expand_body_format
+        )
 
-    def _get_base_url(self, access_token: str | None = None):
+    async def _get_base_url(self, access_token: str | None = None):
         return self.product_url
 
     def _get_headers(self, access_token: str | None = None) -> dict[str, str]:
@@ -176,37 +201,34 @@ class ServiceAuthConfluenceClient(BaseConfluenceClient):
 
 
 class OAuthConfluenceClient(BaseConfluenceClient):
-    # Cache for token to organization cloud id mappings
-    org_ids: dict[str, str] = {}
+    # Bounded cache of token hash to organization cloud id mappings
+    org_ids = TokenCache()
 
-    def _get_base_url(self, access_token: str | None = None):
+    async def _get_base_url(self, access_token: str | None = None):
         if not access_token:
             raise AssertionError(
                 "Access token required to construct Confluence cloud URLs"
             )
 
-        if access_token in self.org_ids:
-            return (
-                f"https://api.atlassian.com/ex/confluence/{self.org_ids[access_token]}"
-            )
+        if (org_id := self.org_ids.get(access_token)) is not None:
+            return f"https://api.atlassian.com/ex/confluence/{org_id}"
 
-        response = requests.get(
-            "https://api.atlassian.com/oauth/token/accessible-resources",
+        async with self.session.get(
+            ACCESSIBLE_RESOURCES_URL,
             headers=self._get_headers(access_token),
-        )
-
-        if response.status_code != 200:
-            logger.error("Error determining Confluence base URL")
-            return
+        ) as response:
+            if response.status != 200:
+                logger.error("Error determining Confluence base URL")
+                return
 
-        accessible_resources = response.json()
+            accessible_resources = await response.json()
 
         if not accessible_resources:
             logger.error("No resources available to user")
             return
 
         org_id = accessible_resources[0]["id"]
-        self.org_ids[access_token] = org_id
+        self.org_ids.put(access_token, org_id)
 
         return f"https://api.atlassian.com/ex/confluence/{org_id}"
 
@@ -231,8 +253,16 @@ def get_client():
         except ValueError:
             raise ValueError("SEARCH_LIMIT must be an integer")
 
+        expand_body_format = app.config.get("EXPAND_BODY_FORMAT") or None
+        assert (
+            expand_body_format is None
+            or expand_body_format in BaseConfluenceClient.EXPAND_BODY_FORMATS
+        ), 'CONFLUENCE_EXPAND_BODY_FORMAT must be "storage" or "view"'
+
         if auth_method == "oauth":
-            client = OAuthConfluenceClient()
+            client = OAuthConfluenceClient(
+                search_limit=search_limit, expand_body_format=expand_body_format
+            )
         elif auth_method == "service_auth":
             assert (
                 product_url := app.config.get("PRODUCT_URL")
@@ -242,7 +272,7 @@ def get_client():
                 api_token := app.config.get("API_TOKEN")
             ), "CONFLUENCE_API_TOKEN must be set"
             client = ServiceAuthConfluenceClient(
-                product_url, user, api_token, search_limit
+                product_url, user, api_token, search_limit, expand_body_format
             )
 
     return client
@@ -0,0 +1,69 @@
+from html.parser import HTMLParser
+
+# Tags that start a new line of text when rendered
+BLOCK_TAGS = {
+    "ac:plain-text-body",
+    "ac:rich-text-body",
+    "ac:structured-macro",
+    "br",
+    "div",
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "h6",
+    "hr",
+    "li",
+    "p",
+    "pre",
+    "table",
+    "td",
+    "th",
+    "tr",
+}
+
+# Tags whose contents are not text, such as macro parameters and scripts
+SKIPPED_TAGS = {"ac:parameter", "script", "style"}
+
+
+class StorageFormatTextExtractor(HTMLParser):
+    """
+    Converts Confluence storage format (XHTML with ac: and ri: macro tags) or
+    rendered view HTML to plain text in a single streaming pass.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self.skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self.skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS and self.skip_depth > 0:
+            self.skip_depth -= 1
+
+    def handle_data(self, data):
+        if self.skip_depth == 0:
+            self.parts.append(data)
+
+    def unknown_decl(self, data):
+        # Code and plain text macro bodies are wrapped in CDATA sections
+        if data.startswith("CDATA[") and self.skip_depth == 0:
+            self.parts.append(data.removeprefix("CDATA["))
+
+    def get_text(self):
+        lines = "".join(self.parts).splitlines()
+        return "\n".join(line.strip() for line in lines if line.strip())
+
+
+def storage_to_text(value):
+    extractor = StorageFormatTextExtractor()
+    extractor.feed(value)
+    extractor.close()
+    return extractor.get_text()
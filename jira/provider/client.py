@@ -2,14 +2,20 @@ from atlassian import Jira
 import requests
 from flask import current_app as app, request
 from . import UpstreamProviderError
+from .atlassian_auth import ACCESSIBLE_RESOURCES_URL, TokenCache
 
 AUTHORIZATION_HEADER = "Authorization"
 BEARER_PREFIX = "Bearer "
 
+# Ready Jira clients for each OAuth access token, so repeat callers skip the
+# accessible-resources round trip
+oauth_clients = TokenCache()
+basic_client = None
+
 
 class JiraClient:
     JIRA_API_URL = "https://api.atlassian.com/ex/jira/"
-    JIRA_RESOURCE_URL = "https://api.atlassian.com/oauth/token/accessible-resources"
+    JIRA_RESOURCE_URL = ACCESSIBLE_RESOURCES_URL
     DEFAULT_SEARCH_LIMIT = 10
 
     def __init__(self):
@@ -49,6 +55,10 @@ class JiraClient:
             raise UpstreamProviderError(
                 f"Error while initializing Jira client: no access token found"
             )
+        if (cached_client := oauth_clients.get(token)) is not None:
+            self.client = cached_client
+            return self.client
+
         try:
             url = self.construct_api_request_url(token)
             self.client = Jira(
@@ -63,20 +73,26 @@ class JiraClient:
                 f"Error while initializing Jira client: {str(e)}"
             )
 
+        oauth_clients.put(token, self.client)
         return self.client
 
     def setup_basic_client(self, user_email, org_domain, api_token):
-        try:
-            self.client = Jira(
-                url=org_domain,
-                username=user_email,
-                password=api_token,
-            )
-        except Exception as e:
-            raise UpstreamProviderError(
-                f"Error while initializing Jira client: {str(e)}"
-            )
-
+        global basic_client
+
+        # The credentials are fixed, so a single Jira client serves every request
+        if basic_client is None:
+            try:
+                basic_client = Jira(
+                    url=org_domain,
+                    username=user_email,
+                    password=api_token,
+                )
+            except Exception as e:
+                raise UpstreamProviderError(
+                    f"Error while initializing Jira client: {str(e)}"
+                )
+
+        self.client = basic_client
         return self.client
 
 
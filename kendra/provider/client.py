@@ -1,32 +1,130 @@
+import threading
+import time
+from collections import OrderedDict
+
 from flask import current_app as app
 import botocore
 import boto3
+from botocore.config import Config
 from . import UpstreamProviderError
 
 client = None
 
+# Kendra's Retrieve API returns at most 100 passages per page
+MAX_PAGE_SIZE = 100
+CACHE_SIZE = 1000
+
+
+def flatten_result(item):
+    """
+    Flatten a Retrieve result item, turning its DocumentAttributes list into plain
+    key-value pairs and keeping only the score confidence of its ScoreAttributes.
+    """
+    result = {
+        k: v
+        for k, v in item.items()
+        if k not in ("DocumentAttributes", "ScoreAttributes")
+    }
+    for attribute in item.get("DocumentAttributes", []):
+        # Each value holds exactly one of StringValue, StringListValue, LongValue or DateValue
+        (value,) = attribute["Value"].values()
+        result[attribute["Key"]] = value
+    if confidence := item.get("ScoreAttributes", {}).get("ScoreConfidence"):
+        result["ScoreConfidence"] = confidence
+
+    return result
+
 
 class KendraClient:
     DEFAULT_FIELDS_MAPPING = {}
     DEFAULT_SEARCH_LIMIT = 10
+    DEFAULT_CACHE_TTL = 60
+    DEFAULT_MAX_POOL_CONNECTIONS = 25
+    DEFAULT_MAX_ATTEMPTS = 5
 
-    def __init__(self, index_id, search_limit=None, fields_mapping=None):
+    def __init__(
+        self,
+        index_id,
+        search_limit=None,
+        fields_mapping=None,
+        attribute_filter=None,
+        document_attributes=None,
+        user_context=None,
+        cache_ttl=None,
+        max_pool_connections=None,
+    ):
         self.index_id = index_id
         self.search_limit = search_limit or self.DEFAULT_SEARCH_LIMIT
         self.fields_mapping = fields_mapping or self.DEFAULT_FIELDS_MAPPING
-        self.kendra = boto3.client("kendra")
+        self.attribute_filter = attribute_filter
+        self.document_attributes = document_attributes
+        self.user_context = user_context
+        self.cache_ttl = self.DEFAULT_CACHE_TTL if cache_ttl is None else cache_ttl
+        self.cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+        self.kendra = boto3.client(
+            "kendra",
+            config=Config(
+                max_pool_connections=max_pool_connections
+                or self.DEFAULT_MAX_POOL_CONNECTIONS,
+                retries={"max_attempts": self.DEFAULT_MAX_ATTEMPTS, "mode": "adaptive"},
+            ),
+        )
+
+    def _cache_get(self, key):
+        with self.cache_lock:
+            if (entry := self.cache.get(key)) is None:
+                return None
+            expires_at, results = entry
+            if expires_at < time.monotonic():
+                del self.cache[key]
+                return None
+            self.cache.move_to_end(key)
+            return results
+
+    def _cache_put(self, key, results):
+        if self.cache_ttl <= 0:
+            return
+        with self.cache_lock:
+            self.cache[key] = (time.monotonic() + self.cache_ttl, results)
+            self.cache.move_to_end(key)
+            if len(self.cache) > CACHE_SIZE:
+                self.cache.popitem(last=False)
+
+    def _retrieve_params(self, query):
+        params = {"QueryText": query, "IndexId": self.index_id}
+        if self.attribute_filter:
+            params["AttributeFilter"] = self.attribute_filter
+        if self.document_attributes:
+            params["RequestedDocumentAttributes"] = self.document_attributes
+        if self.user_context:
+            params["UserContext"] = self.user_context
+        return params
 
     def search(self, query):
+        # The user context is the same for every search, so the query is the key
+        if (results := self._cache_get(query)) is not None:
+            return results
+
+        params = self._retrieve_params(query)
+        results = []
+        page_number = 1
         try:
-            response = self.kendra.retrieve(
-                QueryText=query,
-                IndexId=self.index_id,
-                PageSize=self.search_limit,
-            )
+            # Page through the results when more are wanted than fit in a single page
+            while len(results) < self.search_limit:
+                page_size = min(self.search_limit - len(results), MAX_PAGE_SIZE)
+                response = self.kendra.retrieve(
+                    **params, PageSize=page_size, PageNumber=page_number
+                )
+                results.extend(map(flatten_result, response["ResultItems"]))
+                if len(response["ResultItems"]) < page_size:
+                    break
+                page_number += 1
         except botocore.exceptions.ClientError as err:
             raise UpstreamProviderError(str(err)) from err
 
-        return response["ResultItems"]
+        self._cache_put(query, results)
+        return results
 
 
 def get_client():
@@ -37,6 +135,23 @@ def get_client():
     assert (index_id := app.config.get("INDEX_ID")), "KENDRA_INDEX_ID must be set"
     search_limit = app.config.get("SEARCH_LIMIT", None)
     fields_mapping = app.config.get("FIELDS_MAPPING", None)
-    client = KendraClient(index_id, search_limit, fields_mapping)
+    document_attributes = [
+        attribute.strip()
+        for attribute in app.config.get("DOCUMENT_ATTRIBUTES", "").split(",")
+        if attribute.strip()
+    ]
+    # An empty KENDRA_CACHE_TTL keeps the default, while 0 disables the cache
+    cache_ttl = app.config.get("CACHE_TTL")
+    cache_ttl = int(cache_ttl) if cache_ttl not in (None, "") else None
+    client = KendraClient(
+        index_id,
+        search_limit,
+        fields_mapping,
+        attribute_filter=app.config.get("ATTRIBUTE_FILTER", None),
+        document_attributes=document_attributes,
+        user_context=app.config.get("USER_CONTEXT", None),
+        cache_ttl=cache_ttl,
+        max_pool_connections=app.config.get("MAX_POOL_CONNECTIONS", None),
+    )
 
     return client
@@ -0,0 +1,29 @@
+import pytest
+from unittest.mock import patch
+from provider import create_app
+
+
+@pytest.fixture
+def app():
+    app = create_app()
+    yield app
+
+
+@pytest.fixture
+def configure_app_env(app):
+    # Fixture to configure the app and modify config during test runtime
+    # Accepts a dictionary of key-value pairs
+    def _configure_app_env(configs):
+        for key, value in configs.items():
+            app.config[key] = value
+
+    return _configure_app_env
+
+
+@pytest.fixture
+def mock_retrieve(monkeypatch):
+    # A new client for each test, which doesn't call AWS
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setattr("provider.client.client", None)
+    with patch("botocore.client.BaseClient._make_api_call") as mock:
+        yield mock
@@ -0,0 +1,27 @@
+from provider.client import KendraClient, get_client
+
+
+def test_empty_cache_ttl_uses_default(app, configure_app_env, mock_retrieve):
+    configure_app_env({"INDEX_ID": "index", "CACHE_TTL": ""})
+    mock_retrieve.return_value = {"ResultItems": [{"Id": "1", "Content": "hello"}]}
+
+    with app.app_context():
+        client = get_client()
+        results = client.search("test")
+        assert client.search("test") == results
+
+    assert client.cache_ttl == KendraClient.DEFAULT_CACHE_TTL
+    assert results == [{"Id": "1", "Content": "hello"}]
+    mock_retrieve.assert_called_once()
+
+
+def test_zero_cache_ttl_disables_cache(app, configure_app_env, mock_retrieve):
+    configure_app_env({"INDEX_ID": "index", "CACHE_TTL": 0})
+    mock_retrieve.return_value = {"ResultItems": []}
+
+    with app.app_context():
+        client = get_client()
+        client.search("test")
+        client.search("test")
+
+    assert mock_retrieve.call_count == 2
@@ -1,17 +1,32 @@
 import logging
-from functools import reduce
 
 from .client import get_client
 
 logger = logging.getLogger(__name__)
 
 
-def get_dict_value_by_dotted_key(dictionary, keys, default=None):
-    return reduce(
-        lambda d, key: d.get(key, default) if isinstance(d, dict) else default,
-        keys.split("."),
-        dictionary,
-    )
+def compile_dotted_key(keys):
+    # Split the path once, at import time, instead of on every lookup
+    path = tuple(keys.split("."))
+
+    def get_value(dictionary, default=None):
+        value = dictionary
+        for key in path:
+            if not isinstance(value, dict):
+                return default
+            value = value.get(key, default)
+        return value
+
+    return get_value
+
+
+get_people_items = compile_dotted_key("data.search.people.items")
+get_tag_items = compile_dotted_key("data.search.tags.items")
+get_post_items = compile_dotted_key("data.search.posts.items")
+get_collection_items = compile_dotted_key("data.search.collections.items")
+get_catalog_items = compile_dotted_key("data.search.catalogs.items")
+get_custom_domain = compile_dotted_key("customDomainState.live.domain")
+get_post_paragraphs = compile_dotted_key("bodyModel.paragraphs")
 
 
 def search_publications(publications, query):
@@ -34,18 +49,18 @@ def search_publications(publications, query):
 
 def serialize_graphql_results(data):
     results = []
-    if peoples := get_dict_value_by_dotted_key(data, "data.search.people.items"):
+    if peoples := get_people_items(data):
         for people in peoples:
             item_to_append = people
             item_to_append["title"] = people.pop("name")
             item_to_append["text"] = people.pop("bio")
-            url = get_dict_value_by_dotted_key(people, "customDomainState.live.domain")
+            url = get_custom_domain(people)
             if url:
                 item_to_append["url"] = f"https://{url}"
             else:
                 item_to_append["url"] = f"https://medium.com/@{people['username']}"
             results.append({k: str(v) for k, v in item_to_append.items()})
-    if tags := get_dict_value_by_dotted_key(data, "data.search.tags.items"):
+    if tags := get_tag_items(data):
         for tag in tags:
             item_to_append = tag
             item_to_append["title"] = tag.pop("displayTitle")
@@ -54,13 +69,12 @@ def serialize_graphql_results(data):
             if url:
                 item_to_append["url"] = f"https://medium.com/tag/{url}"
             results.append({k: str(v) for k, v in item_to_append.items()})
-    if posts := get_dict_value_by_dotted_key(data, "data.search.posts.items"):
+    if posts := get_post_items(data):
         for post in posts:
             item_to_append = post
             item_to_append["title"] = post.pop("title")
-            paragraphs = get_dict_value_by_dotted_key(
-                post, "extendedPreviewContent.bodyModel.paragraphs"
-            )
+            # The preview is only needed for its text, don't ship the raw body model
+            paragraphs = get_post_paragraphs(post.pop("extendedPreviewContent", None))
             if paragraphs:
                 all_text = ""
                 for paragraph in paragraphs:
@@ -70,9 +84,7 @@ def serialize_graphql_results(data):
             if url:
                 item_to_append["url"] = url
             results.append({k: str(v) for k, v in item_to_append.items()})
-    if publications := get_dict_value_by_dotted_key(
-        data, "data.search.collections.items"
-    ):
+    if publications := get_collection_items(data):
         for publication in publications:
             item_to_append = publication
             item_to_append["title"] = publication.pop("name")
@@ -81,7 +93,7 @@ def serialize_graphql_results(data):
             if url:
                 item_to_append["url"] = f"https://medium.com/{url}"
             results.append({k: str(v) for k, v in item_to_append.items()})
-    if catalogs := get_dict_value_by_dotted_key(data, "data.search.catalogs.items"):
+    if catalogs := get_catalog_items(data):
         for catalog in catalogs:
             item_to_append = catalog
             item_to_append["title"] = catalog.pop("name")
@@ -1,25 +1,103 @@
+import heapq
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
+
 from flask import current_app as app
+from pymongo.errors import PyMongoError
 
+from . import UpstreamProviderError
 from .client import get_client
 
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEARCH_LIMIT = 20
+DEFAULT_ATLAS_SEARCH_INDEX = "default"
+SEARCH_MODES = ["text", "atlas"]
+
+# Relevance score added to each document by the pipeline, removed before serializing
+SCORE_FIELD = "_score"
+
+
+def build_pipeline(query, search_mode, search_index, limit, fields):
+    if search_mode == "atlas":
+        # Atlas Search returns documents already ordered by relevance
+        pipeline = [
+            {
+                "$search": {
+                    "index": search_index,
+                    "text": {"query": query, "path": {"wildcard": "*"}},
+                }
+            },
+            {"$limit": limit},
+        ]
+        score = {"$meta": "searchScore"}
+    else:
+        pipeline = [
+            {"$match": {"$text": {"$search": query}}},
+            {"$sort": {"score": {"$meta": "textScore"}}},
+            {"$limit": limit},
+        ]
+        score = {"$meta": "textScore"}
+
+    if fields:
+        pipeline.append(
+            {"$project": {**{field: 1 for field in fields}, SCORE_FIELD: score}}
+        )
+    else:
+        pipeline.append({"$addFields": {SCORE_FIELD: score}})
+
+    return pipeline
+
+
+def search_collection(collection, pipeline):
+    try:
+        return list(collection.aggregate(pipeline))
+    except PyMongoError as error:
+        raise UpstreamProviderError(
+            f"Error searching MongoDB collection {collection.name}: {error}"
+        ) from error
+
 
 def search(query) -> list[dict[str, Any]]:
     assert (db := app.config.get("DB")), "MONGODB_DB must be set"
     assert (
         collections := app.config.get("COLLECTIONS")
     ), "MONGODB_COLLECTIONS must be set"
+    search_mode = app.config.get("SEARCH_MODE", "text")
+    assert (
+        search_mode in SEARCH_MODES
+    ), f"MONGODB_SEARCH_MODE must be one of {', '.join(SEARCH_MODES)}"
+    search_index = app.config.get("ATLAS_SEARCH_INDEX", DEFAULT_ATLAS_SEARCH_INDEX)
+    search_limit = int(app.config.get("SEARCH_LIMIT", DEFAULT_SEARCH_LIMIT))
+    fields = [
+        field.strip()
+        for field in app.config.get("PROJECTION_FIELDS", "").split(",")
+        if field.strip()
+    ]
 
     client = get_client()
     search_collections = collections.split(",")
     db = client[db]
+    pipeline = build_pipeline(query, search_mode, search_index, search_limit, fields)
 
-    results = []
-    for collection in search_collections:
-        collection_results = db[collection].find({"$text": {"$search": query}})
+    # Each collection returns at most search_limit documents, so the merge
+    # below only ever holds a bounded number of them
+    with ThreadPoolExecutor(max_workers=len(search_collections)) as executor:
+        collection_results = executor.map(
+            lambda collection: search_collection(db[collection], pipeline),
+            search_collections,
+        )
+        documents = [document for results in collection_results for document in results]
+
+    top_documents = heapq.nlargest(
+        search_limit, documents, key=lambda document: document.get(SCORE_FIELD, 0)
+    )
 
-        for result in collection_results:
-            results.append(serialize_result(dict(result)))
+    results = []
+    for document in top_documents:
+        document.pop(SCORE_FIELD, None)
+        results.append(serialize_result(document))
 
     return results
 
@@ -38,7 +116,7 @@ def flatten_obj(d, parent_key="", sep="_"):
 
 
 def serialize_result(result):
-    mappings = app.config.get("CONNECTOR_FIELD_MAPPING")
+    mappings = app.config.get("CONNECTOR_FIELD_MAPPING", {})
 
     # Add any connector mappings, e.g: text, title
     for key, value in mappings.items():
@@ -4,27 +4,46 @@ import aiohttp
 
 import requests
 from flask import current_app as app, request
-from msal import ConfidentialClientApplication
 
 from . import UpstreamProviderError
+from .graph_auth import acquire_token_for_client
 
 AUTHORIZATION_HEADER = "Authorization"
 BEARER_PREFIX = "Bearer "
 
+DEFAULT_ATTACHMENT_MAX_BYTES = 10 * 1024 * 1024  # 10 MB to bytes
+DEFAULT_ATTACHMENTS_TOTAL_MAX_BYTES = 50 * 1024 * 1024  # 50 MB to bytes
+
 
 class MsTeamsClient:
     DEFAULT_SCOPES = ["https://graph.microsoft.com/.default"]
     SEARCH_URL = "https://graph.microsoft.com/v1.0/search/query"
+    BATCH_URL = "https://graph.microsoft.com/v1.0/$batch"
+    # Graph accepts at most 20 sub-requests per $batch call
+    BATCH_SIZE = 20
+    MESSAGE_FIELDS = (
+        "id,subject,summary,body,from,createdDateTime,webUrl,attachments,eventDetail"
+    )
+    DOWNLOAD_CHUNK_BYTES = 64 * 1024
     SEARCH_ENTITY_TYPES = ["chatMessage"]
     APPLICATION_AUTH = "application"
     DELEGATED_AUTH = "user"
 
-    def __init__(self, auth_type, search_limit=5):
+    def __init__(
+        self,
+        auth_type,
+        search_limit=5,
+        attachment_max_bytes=DEFAULT_ATTACHMENT_MAX_BYTES,
+        attachments_total_max_bytes=DEFAULT_ATTACHMENTS_TOTAL_MAX_BYTES,
+    ):
         self.access_token = None
         self.headers = None
         self.user = None
         self.auth_type = auth_type
         self.search_limit = search_limit
+        self.attachment_max_bytes = attachment_max_bytes
+        self.attachments_total_max_bytes = attachments_total_max_bytes
+        self.downloaded_bytes = 0
         self.session = None
         self.loop = None
         self._start_session()
@@ -35,10 +54,6 @@ class MsTeamsClient:
     def get_auth_type(self):
         return self.auth_type
 
-    def _close_loop(self):
-        self.loop.stop()
-        self.loop.close()
-
     def _start_session(self):
         self.loop = asyncio.new_event_loop()
         self.session = aiohttp.ClientSession(loop=self.loop)
@@ -46,16 +61,17 @@ class MsTeamsClient:
     async def _close_session(self):
         await self.session.close()
 
+    def close(self):
+        # Session closing must be done in an async method, before the loop is closed
+        if self.loop is None or self.loop.is_closed():
+            return
+        self.loop.run_until_complete(self._close_session())
+        self.loop.close()
+
     def set_app_access_token(self, tenant_id, client_id, client_secret):
         try:
-            credential = ConfidentialClientApplication(
-                client_id=client_id,
-                client_credential=client_secret,
-                authority=f"https://login.microsoftonline.com/{tenant_id}",
-            )
-
-            token_response = credential.acquire_token_for_client(
-                scopes=self.DEFAULT_SCOPES,
+            token_response = acquire_token_for_client(
+                tenant_id, client_id, client_secret, self.DEFAULT_SCOPES
             )
             if "access_token" not in token_response:
                 raise UpstreamProviderError(
@@ -72,26 +88,48 @@ class MsTeamsClient:
         self.access_token = token
         self.headers = {"Authorization": f"Bearer {self.access_token}"}
 
-    async def _gather_messages(self, hits):
-        messages = [self._get_message(hit) for hit in hits]
-        return await asyncio.gather(*messages)
-
-    async def _get_message(self, hit):
-        url = f"https://graph.microsoft.com/v1.0/chats/{hit['resource']['chatId']}/messages/{hit['resource']['id']}"
-        params = {
-            "$select": "id,subject,summary,body,from,createdDateTime,webUrl,attachments,eventDetail",
+    def _get_message_request(self, request_id, hit):
+        return {
+            "id": str(request_id),
+            "method": "GET",
+            "url": f"/chats/{hit['resource']['chatId']}/messages/{hit['resource']['id']}"
+            f"?$select={self.MESSAGE_FIELDS}",
         }
 
-        async with self.session.get(
-            url,
+    async def _batch_get_messages(self, hits):
+        async with self.session.post(
+            self.BATCH_URL,
             headers=self.headers,
-            params=params,
+            json={
+                "requests": [
+                    self._get_message_request(index, hit)
+                    for index, hit in enumerate(hits)
+                ]
+            },
         ) as response:
-            content = await response.json()
             if not response.ok:
-                return None
-            content["link"] = hit["resource"]["webLink"]
-            return content
+                return [None] * len(hits)
+            content = await response.json()
+
+        messages = [None] * len(hits)
+        for sub_response in content.get("responses", []):
+            # Fail gracefully on individual messages, as with single GETs
+            if sub_response.get("status") != 200:
+                continue
+            index = int(sub_response["id"])
+            message = sub_response["body"]
+            message["link"] = hits[index]["resource"]["webLink"]
+            messages[index] = message
+
+        return messages
+
+    async def _gather_messages(self, hits):
+        batches = [
+            self._batch_get_messages(hits[start : start + self.BATCH_SIZE])
+            for start in range(0, len(hits), self.BATCH_SIZE)
+        ]
+        results = await asyncio.gather(*batches)
+        return [message for batch in results for message in batch]
 
     async def _gather_downloadable_attachments(self, attachments):
         downloadable_attachments = [
@@ -110,10 +148,38 @@ class MsTeamsClient:
             f"https://graph.microsoft.com/v1.0/shares/{prepared}/driveItem/content"
         )
         async with self.session.get(graph_api_url, headers=self.headers) as response:
-            content = await response.content.read()
             if not response.ok:
                 return attachment
-            attachment["content"] = content
+            # Skip early when the declared size is already over the limit
+            if (
+                response.content_length is not None
+                and response.content_length > self.attachment_max_bytes
+            ):
+                return attachment
+
+            chunks = []
+            size = 0
+            kept = False
+            try:
+                async for chunk in response.content.iter_chunked(
+                    self.DOWNLOAD_CHUNK_BYTES
+                ):
+                    # Bytes are reserved against the total as they arrive, so the
+                    # downloads running together can't buffer more than the total
+                    size += len(chunk)
+                    self.downloaded_bytes += len(chunk)
+                    if (
+                        size > self.attachment_max_bytes
+                        or self.downloaded_bytes > self.attachments_total_max_bytes
+                    ):
+                        return attachment
+                    chunks.append(chunk)
+                kept = True
+            finally:
+                # An aborted download releases its bytes for the other attachments
+                if not kept:
+                    self.downloaded_bytes -= size
+            attachment["content"] = b"".join(chunks)
             return attachment
 
     def _prepare_attachments(self, messages, results):
@@ -130,12 +196,10 @@ class MsTeamsClient:
                     attachments.append(attachment)
             results.append(message)
         if len(attachments) > 0:
+            self.downloaded_bytes = 0
             self.loop.run_until_complete(
                 self._gather_downloadable_attachments(attachments)
             )
-        # Close session and loop
-        self.loop.run_until_complete(self._close_session())
-        self._close_loop()
         return attachments
 
     def _process_hits(self, hits):
@@ -184,7 +248,7 @@ class MsTeamsClient:
         )
 
         params = {
-            "$select": "id,subject,summary,body,from,createdDateTime,webUrl,attachments,eventDetail",
+            "$select": self.MESSAGE_FIELDS,
             "$top": self.search_limit,
         }
         # Make a request to the Microsoft Graph API to get messages
@@ -217,7 +281,22 @@ def get_client():
         auth_type := app.config.get("GRAPH_AUTH_TYPE")
     ), "MSTEAMS_GRAPH_AUTH_TYPE must be set"
     search_limit = app.config.get("SEARCH_LIMIT", 5)
-    client = MsTeamsClient(auth_type, search_limit)
+    try:
+        attachment_max_bytes = int(
+            app.config.get("ATTACHMENT_MAX_BYTES", DEFAULT_ATTACHMENT_MAX_BYTES)
+        )
+        attachments_total_max_bytes = int(
+            app.config.get(
+                "ATTACHMENTS_TOTAL_MAX_BYTES", DEFAULT_ATTACHMENTS_TOTAL_MAX_BYTES
+            )
+        )
+    except ValueError:
+        raise ValueError(
+            "MSTEAMS_ATTACHMENT_MAX_BYTES and MSTEAMS_ATTACHMENTS_TOTAL_MAX_BYTES must be integers"
+        )
+    client = MsTeamsClient(
+        auth_type, search_limit, attachment_max_bytes, attachments_total_max_bytes
+    )
     if auth_type == client.APPLICATION_AUTH:
         assert (
             tenant_id := app.config.get("GRAPH_TENANT_ID")
@@ -45,7 +45,8 @@ def prepare_attachments_to_parse(results):
             [
                 attachment
                 for attachment in result["attachments"]
-                if attachment["contentType"] == "reference"
+                # Attachments over the download limits have no content to parse
+                if attachment["contentType"] == "reference" and "content" in attachment
             ]
         )
     return attachments_to_parse
@@ -87,7 +88,10 @@ def filter_results_by_query(results, query):
 
 def search(query):
     client = get_client()
-    results = client.search(query)
+    try:
+        results = client.search(query)
+    finally:
+        client.close()
     results = parse_results_attachments(results)
     if client.get_auth_type() == client.APPLICATION_AUTH:
         results = filter_results_by_query(results, query)
@@ -1,16 +1,69 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+
 import requests
 from flask import current_app as app, request
-from msal import ConfidentialClientApplication
 
 from . import UpstreamProviderError
+from .graph_auth import acquire_token_for_client
 
 AUTHORIZATION_HEADER = "Authorization"
 BEARER_PREFIX = "Bearer "
 
+# Messages hydrated from search hits, keyed by (principal, internetMessageId).
+# Entries expire so edited or deleted mail isn't served for long.
+MESSAGE_CACHE_SIZE = 1000
+MESSAGE_CACHE_TTL_SECONDS = 5 * 60
+MISSING = object()
+
+
+class MessageCache:
+    """
+    Bounded, expiring cache of hydrated messages, safe to share between the
+    threads serving requests. The least recently used entries are evicted first.
+    """
+
+    def __init__(
+        self, max_size=MESSAGE_CACHE_SIZE, ttl_seconds=MESSAGE_CACHE_TTL_SECONDS
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        # Returns MISSING on a miss, since a message id may have no messages
+        with self.lock:
+            if (entry := self.entries.get(key)) is None:
+                return MISSING
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return MISSING
+            self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+
+message_cache = MessageCache()
+
 
 class OutlookClient:
     DEFAULT_SCOPES = ["https://graph.microsoft.com/.default"]
     SEARCH_URL = "https://graph.microsoft.com/v1.0/search/query"
+    BATCH_URL = "https://graph.microsoft.com/v1.0/$batch"
+    # Graph accepts at most 20 sub-requests per $batch call
+    BATCH_SIZE = 20
+    MESSAGE_FIELDS = "id,subject,bodyPreview,body,from,receivedDateTime,webLink,toRecipients,hasAttachments"
     APPLICATION_AUTH = "application"
     DELEGATED_AUTH = "user"
 
@@ -25,14 +78,8 @@ class OutlookClient:
 
     def set_app_access_token(self, tenant_id, client_id, client_secret):
         try:
-            credential = ConfidentialClientApplication(
-                client_id=client_id,
-                client_credential=client_secret,
-                authority=f"https://login.microsoftonline.com/{tenant_id}",
-            )
-
-            token_response = credential.acquire_token_for_client(
-                scopes=self.DEFAULT_SCOPES,
+            token_response = acquire_token_for_client(
+                tenant_id, client_id, client_secret, self.DEFAULT_SCOPES
             )
             if "access_token" not in token_response:
                 raise UpstreamProviderError(
@@ -61,7 +108,7 @@ class OutlookClient:
 
         params = {
             "$search": f'"{query}"',
-            "$select": "id,subject,bodyPreview,body,from,receivedDateTime,webLink,toRecipients,hasAttachments",
+            "$select": self.MESSAGE_FIELDS,
             "$top": self.search_limit,
         }
         # Make a request to the Microsoft Graph API to get messages
@@ -76,22 +123,76 @@ class OutlookClient:
 
         return results
 
-    def _get_messages(self, hit):
+    def _get_principal(self):
+        return hashlib.sha256(self.access_token.encode("utf-8")).hexdigest()
+
+    def _get_message_request(self, request_id, internet_message_id):
         params = {
-            "$filter": f"internetMessageId eq '{hit['resource']['internetMessageId']}'",
-            "$select": "id,subject,bodyPreview,body,from,receivedDateTime,webLink,toRecipients,hasAttachments",
+            "$filter": f"internetMessageId eq '{internet_message_id}'",
+            "$select": self.MESSAGE_FIELDS,
         }
-        body_response = requests.get(
-            url=f"https://graph.microsoft.com/v1.0/me/messages",
-            params=params,
-            headers={"Authorization": f"Bearer {self.access_token}"},
+
+        return {
+            "id": str(request_id),
+            "method": "GET",
+            "url": f"/me/messages?{urlencode(params)}",
+        }
+
+    def _batch_get_messages(self, internet_message_ids):
+        messages = {}
+        for start in range(0, len(internet_message_ids), self.BATCH_SIZE):
+            chunk = internet_message_ids[start : start + self.BATCH_SIZE]
+            response = requests.post(
+                self.BATCH_URL,
+                headers={"Authorization": f"Bearer {self.access_token}"},
+                json={
+                    "requests": [
+                        self._get_message_request(index, internet_message_id)
+                        for index, internet_message_id in enumerate(chunk)
+                    ]
+                },
+            )
+            if not response.ok:
+                raise UpstreamProviderError(
+                    f"Error while fetching Outlook messages: {response.text}"
+                )
+            for sub_response in response.json().get("responses", []):
+                # Fail gracefully on individual messages, as with single GETs
+                if sub_response.get("status") != 200:
+                    continue
+                internet_message_id = chunk[int(sub_response["id"])]
+                messages[internet_message_id] = sub_response["body"]["value"]
+
+        return messages
+
+    def _get_messages(self, hits):
+        principal = self._get_principal()
+        internet_message_ids = list(
+            dict.fromkeys(hit["resource"]["internetMessageId"] for hit in hits)
         )
-        if body_response.ok:
-            return body_response.json()["value"]
-        return None
+        messages = {}
+        for internet_message_id in internet_message_ids:
+            cached = message_cache.get((principal, internet_message_id))
+            if cached is not MISSING:
+                messages[internet_message_id] = cached
+
+        missing_ids = [
+            internet_message_id
+            for internet_message_id in internet_message_ids
+            if internet_message_id not in messages
+        ]
+        fetched = self._batch_get_messages(missing_ids) if missing_ids else {}
+        for internet_message_id, fetched_messages in fetched.items():
+            message_cache.put((principal, internet_message_id), fetched_messages)
+        messages.update(fetched)
 
-    def _user_search(self, query):
         results = []
+        for internet_message_id in internet_message_ids:
+            results.extend(messages.get(internet_message_id, []))
+
+        return results
+
+    def _user_search(self, query):
         response = requests.post(
             self.SEARCH_URL,
             headers={"Authorization": f"Bearer {self.access_token}"},
@@ -110,15 +211,14 @@ class OutlookClient:
             raise UpstreamProviderError(
                 f"Error while searching Outlook: {response.text}"
             )
+        hits = []
         for hit_container in response.json()["value"][0]["hitsContainers"]:
             if hit_container["total"]:
                 for hit in hit_container["hits"]:
                     if hit["resource"]["@odata.type"] == "#microsoft.graph.message":
-                        matching_messages = self._get_messages(hit)
-                        if matching_messages is not None:
-                            results.extend(matching_messages)
+                        hits.append(hit)
 
-        return results
+        return self._get_messages(hits)
 
     def search(self, query):
         if self.access_token is None:
@@ -1,6 +1,5 @@
 import logging
-
-from bs4 import BeautifulSoup
+from html.parser import HTMLParser
 
 from .client import get_client
 
@@ -10,9 +9,37 @@ cached_pages = {}
 token = None
 
 
+class HTMLTextExtractor(HTMLParser):
+    # Contents of these tags are not text, matching BeautifulSoup.get_text()
+    SKIPPED_TAGS = {"script", "style", "template"}
+
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self.skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED_TAGS:
+            self.skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED_TAGS and self.skip_depth > 0:
+            self.skip_depth -= 1
+
+    def handle_data(self, data):
+        if self.skip_depth == 0:
+            self.parts.append(data)
+
+    def get_text(self):
+        return "".join(self.parts)
+
+
 def strip_html_tags(html_text):
-    soup = BeautifulSoup(html_text, "html.parser")
-    return soup.get_text()
+    # Stream the markup through a flat parser instead of building a soup tree
+    extractor = HTMLTextExtractor()
+    extractor.feed(html_text)
+    extractor.close()
+    return extractor.get_text()
 
 
 def serialize_results(results):
@@ -5,18 +5,36 @@ import pinecone
 
 logger = logging.getLogger(__name__)
 
+try:
+    from pinecone.grpc import PineconeGRPC
+except ImportError:
+    # Requires the pinecone-client[grpc] extra
+    PineconeGRPC = None
+
 cohere_client = None
 pinecone_client = None
 
 
 class PineconeClient:
-    def __init__(self, api_key, index):
-        self.client = pinecone.Pinecone(api_key=api_key)
+    def __init__(self, api_key, index, use_grpc=False):
+        if use_grpc:
+            assert (
+                PineconeGRPC is not None
+            ), "PINECONE_USE_GRPC requires the pinecone-client[grpc] extra"
+            self.client = PineconeGRPC(api_key=api_key)
+        else:
+            self.client = pinecone.Pinecone(api_key=api_key)
         self.index = self.client.Index(index)
 
-    def query(self, query, top_k=100, include_metadata=True):
+    def query(
+        self, query, top_k=100, include_metadata=True, namespace=None, filter=None
+    ):
         return self.index.query(
-            vector=query, top_k=top_k, include_metadata=include_metadata
+            vector=query,
+            top_k=top_k,
+            include_metadata=include_metadata,
+            namespace=namespace,
+            filter=filter,
         )
 
 
@@ -28,10 +46,10 @@ class CohereClient:
         return self.client.embed([query], model=model, input_type=input_type).embeddings
 
 
-def get_pinecone_client(api_key, index):
+def get_pinecone_client(api_key, index, use_grpc=False):
     global pinecone_client
     if not pinecone_client:
-        pinecone_client = PineconeClient(api_key, index)
+        pinecone_client = PineconeClient(api_key, index, use_grpc)
 
     return pinecone_client
 
@@ -1,4 +1,6 @@
+import heapq
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 from flask import current_app as app
 
@@ -6,6 +8,8 @@ from .client import get_cohere_client, get_pinecone_client
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_SEARCH_LIMIT = 10
+
 
 def serialize_results(data, mappings={}):
     """
@@ -33,6 +37,26 @@ def serialize_results(data, mappings={}):
     return serialized_data
 
 
+def split_filter_prefixes(query, filter_fields):
+    """
+    Split leading "field:value" terms off the query and turn them into a Pinecone
+    metadata filter, e.g. "lang:en author:smith grilling tips" searches for
+    "grilling tips" with {"lang": {"$eq": "en"}, "author": {"$eq": "smith"}}.
+    Only fields listed in filter_fields are recognized.
+    """
+    metadata_filter = {}
+    terms = query.split()
+    while terms:
+        field, separator, value = terms[0].partition(":")
+        if not separator or not value or field not in filter_fields:
+            break
+        metadata_filter[field] = {"$eq": value}
+        terms.pop(0)
+
+    # Keep the original query if it only consisted of filter terms
+    return " ".join(terms) or query, metadata_filter
+
+
 def search(query):
     assert (api_key := app.config.get("API_KEY")), "PINECONE_API_KEY must be set"
     assert (index := app.config.get("INDEX")), "PINECONE_INDEX must be set"
@@ -43,20 +67,53 @@ def search(query):
         cohere_embed_model := app.config.get("COHERE_EMBED_MODEL")
     ), "PINECONE_COHERE_EMBED_MODEL must be set"
 
+    search_limit = int(app.config.get("SEARCH_LIMIT", DEFAULT_SEARCH_LIMIT))
+    namespaces = app.config.get("NAMESPACES", "").split(",")
+    metadata_fields = [
+        field.strip()
+        for field in app.config.get("METADATA_FIELDS", "").split(",")
+        if field.strip()
+    ]
+    filter_fields = {
+        field.strip() for field in app.config.get("FILTER_FIELDS", "").split(",")
+    } - {""}
+
+    query, metadata_filter = split_filter_prefixes(query, filter_fields)
+
     cohere_client = get_cohere_client(cohere_api_key)
     # Pulling just the query embedding vector
     xq = cohere_client.get_embeddings(query, cohere_embed_model)[0]
 
-    pinecone_client = get_pinecone_client(api_key, index)
+    pinecone_client = get_pinecone_client(
+        api_key, index, bool(app.config.get("USE_GRPC", False))
+    )
 
-    search_limit = app.config.get("SEARCH_LIMIT", 100)
+    def query_namespace(namespace):
+        return pinecone_client.query(
+            xq,
+            search_limit,
+            namespace=namespace or None,
+            filter=metadata_filter or None,
+        ).matches
 
-    pinecone_results = pinecone_client.query(xq, search_limit)
+    # Namespaces are queried concurrently and the matches merged by score
+    with ThreadPoolExecutor(max_workers=len(namespaces)) as executor:
+        matches = [
+            match
+            for namespace_matches in executor.map(query_namespace, namespaces)
+            for match in namespace_matches
+        ]
+    if len(namespaces) > 1:
+        matches = heapq.nlargest(search_limit, matches, key=lambda match: match.score)
 
-    results = [
-        {"id": match["id"], **match["metadata"]}
-        for match in pinecone_results["matches"]
-    ]
+    results = []
+    for match in matches:
+        metadata = match.metadata or {}
+        if metadata_fields:
+            metadata = {
+                field: metadata[field] for field in metadata_fields if field in metadata
+            }
+        results.append({"id": match.id, **metadata})
 
     mapping = app.config.get("FIELDS_MAPPING", {})
     return serialize_results(results, mapping)
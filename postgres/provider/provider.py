@@ -1,30 +1,93 @@
 import logging
+import threading
+import uuid
 
 import psycopg2
 import psycopg2.extras
+import psycopg2.pool
 from flask import current_app as app
+from psycopg2 import sql
 
 logger = logging.getLogger(__name__)
-pg_connection = None
+pg_pool = None
+pool_lock = threading.Lock()
 
+DEFAULT_MAX_CONNECTIONS = 10
+
+
+def get_identifier(name):
+    # Allow schema qualified names, e.g. public.bbq
+    return sql.Identifier(*name.split("."))
 
-def search(query):
-    global pg_connection
 
-    if pg_connection is None:
-        pg_connection = psycopg2.connect(app.config["DSN"])
+def build_search_query():
+    columns = app.config.get("SELECT_COLUMNS")
+    headline_column = app.config.get("HEADLINE_COLUMN")
+    fts_column = get_identifier(app.config["FTS_COLUMN"])
 
-    cursor = pg_connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    if columns:
+        projection = [get_identifier(column.strip()) for column in columns.split(",")]
+    else:
+        projection = [sql.SQL("*")]
+    if headline_column:
+        # Return a snippet around the matches instead of the full column text
+        projection.append(
+            sql.SQL(
+                "ts_headline(%(lang)s::regconfig, {column}, search_query) AS {alias}"
+            ).format(
+                column=get_identifier(headline_column),
+                alias=sql.Identifier(headline_column.split(".")[-1]),
+            )
+        )
 
-    search_query = (
-        "SELECT * "
-        f'FROM {app.config["TABLE_NAME"]} '
-        f'WHERE {app.config["FTS_COLUMN"]} @@ to_tsquery(\'{app.config["FTS_LANG"]}\', %s)'
+    return sql.SQL(
+        "SELECT {projection} "
+        "FROM {table}, websearch_to_tsquery(%(lang)s::regconfig, %(query)s) search_query "
+        "WHERE {fts_column} @@ search_query "
+        "ORDER BY ts_rank({fts_column}, search_query) DESC "
+        "LIMIT %(limit)s"
+    ).format(
+        projection=sql.SQL(", ").join(projection),
+        table=get_identifier(app.config["TABLE_NAME"]),
+        fts_column=fts_column,
     )
 
-    query_and = query.replace(" ", " & ")
-    cursor.execute(search_query, (query_and,))
-    response = cursor.fetchall()
-    cursor.close()
+
+def get_pool():
+    # Each search runs on its own connection, as threaded workers search concurrently
+    global pg_pool
+
+    with pool_lock:
+        if pg_pool is None:
+            pg_pool = psycopg2.pool.ThreadedConnectionPool(
+                1,
+                int(app.config.get("MAX_CONNECTIONS") or DEFAULT_MAX_CONNECTIONS),
+                app.config["DSN"],
+            )
+    return pg_pool
+
+
+def search(query):
+    search_limit = int(app.config.get("SEARCH_LIMIT", 10))
+    params = {
+        "lang": app.config["FTS_LANG"],
+        "query": query,
+        "limit": search_limit,
+    }
+
+    connection_pool = get_pool()
+    pg_connection = connection_pool.getconn()
+    try:
+        # The LIMIT bounds the rows, which the named cursor keeps on the server
+        # until they are fetched
+        with pg_connection:
+            with pg_connection.cursor(
+                name=f"search_{uuid.uuid4().hex}",
+                cursor_factory=psycopg2.extras.RealDictCursor,
+            ) as cursor:
+                cursor.execute(build_search_query(), params)
+                response = cursor.fetchall()
+    finally:
+        connection_pool.putconn(pg_connection, close=bool(pg_connection.closed))
 
     return response
@@ -7,7 +7,7 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-API_VERSION = "api.yaml"
+API_VERSION = "api-batch.yaml"
 
 
 class UpstreamProviderError(Exception):
@@ -21,6 +21,28 @@ def search(body):
     return {"results": data}, 200, {"X-Connector-Id": app.config.get("APP_ID")}
 
 
+def search_batch(body):
+    logger.debug(f'Batch search request: {body["queries"]}')
+
+    try:
+        data = provider.search_batch(body["queries"])
+        logger.info(f"Found {sum(len(results) for results in data)} results")
+    except UpstreamProviderError as error:
+        logger.error(f"Upstream search error: {error.message}")
+        abort(502, error.message)
+
+    return (
+        {
+            "results": [
+                {"query": query, "results": results}
+                for query, results in zip(body["queries"], data)
+            ]
+        },
+        200,
+        {"X-Connector-Id": app.config.get("APP_ID")},
+    )
+
+
 def apikey_auth(token):
     if token != str(app.config.get("CONNECTOR_API_KEY")):
         raise Unauthorized()
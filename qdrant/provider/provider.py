@@ -2,17 +2,19 @@ from flask import current_app as app
 import logging
 
 import cohere
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import Distance, PointStruct, UpdateStatus, VectorParams
+from qdrant_client import QdrantClient, models
 
 
 logger = logging.getLogger(__name__)
 qdrant_client = None
 cohere_client = None
 
+DEFAULT_SEARCH_LIMIT = 10
+DEFAULT_GRPC_PORT = 6334
+DEFAULT_PAYLOAD_FIELDS = "pid,text"
 
-def search(query):
-    global qdrant_client
+
+def get_cohere_client():
     global cohere_client
 
     if not cohere_client:
@@ -20,25 +22,87 @@ def search(query):
             apikey := app.config.get("COHERE_APIKEY")
         ), "QDRANT_COHERE_APIKEY env var must be set"
         cohere_client = cohere.Client(apikey)
+
+    return cohere_client
+
+
+def get_qdrant_client():
+    global qdrant_client
+
     if not qdrant_client:
         qdrant_client = QdrantClient(
-            app.config["CLUSTER_HOST"], port=app.config["CLUSTER_PORT"]
+            app.config["CLUSTER_HOST"],
+            port=app.config["CLUSTER_PORT"],
+            grpc_port=int(app.config.get("GRPC_PORT", DEFAULT_GRPC_PORT)),
+            prefer_grpc=bool(app.config.get("PREFER_GRPC", False)),
         )
 
+    return qdrant_client
+
+
+def get_search_params():
+    quantization = None
+    if any(
+        key in app.config
+        for key in [
+            "QUANTIZATION_IGNORE",
+            "QUANTIZATION_RESCORE",
+            "QUANTIZATION_OVERSAMPLING",
+        ]
+    ):
+        quantization = models.QuantizationSearchParams(
+            ignore=app.config.get("QUANTIZATION_IGNORE", False),
+            rescore=app.config.get("QUANTIZATION_RESCORE"),
+            oversampling=app.config.get("QUANTIZATION_OVERSAMPLING"),
+        )
+
+    return models.SearchParams(
+        hnsw_ef=app.config.get("HNSW_EF"),
+        exact=app.config.get("EXACT", False),
+        quantization=quantization,
+    )
+
+
+def build_search_request(vector):
+    # Only the payload fields that are returned are fetched, and never the vectors
+    payload_fields = app.config.get("PAYLOAD_FIELDS", DEFAULT_PAYLOAD_FIELDS)
+    return models.SearchRequest(
+        vector=vector,
+        limit=int(app.config.get("SEARCH_LIMIT", DEFAULT_SEARCH_LIMIT)),
+        with_payload=[field.strip() for field in payload_fields.split(",")],
+        with_vector=False,
+        params=get_search_params(),
+        score_threshold=app.config.get("SCORE_THRESHOLD"),
+    )
+
+
+def embed(queries):
     # Since we need a vector in order to query Qdrant, we'll use the Cohere API to generate an embedding.
     # Naturally, you should use the same embedding model that you used to generate the vectors for the original data.
-    xq = cohere_client.embed(
-        [query],
-        model=app.config["COHERE_EMBED_MODEL"],
-    ).embeddings
-
-    search_result = qdrant_client.search(
-        collection_name=app.config["COLLECTION"], query_vector=xq[0], limit=10
+    return (
+        get_cohere_client()
+        .embed(
+            queries,
+            model=app.config["COHERE_EMBED_MODEL"],
+        )
+        .embeddings
     )
 
-    results = [
-        {"pid": result.payload["pid"], "text": result.payload["text"]}
-        for result in search_result
-    ]
 
-    return results
+def serialize_results(search_result):
+    return [dict(result.payload) for result in search_result]
+
+
+def search(query):
+    return search_batch([query])[0]
+
+
+def search_batch(queries):
+    # All queries are embedded in one Cohere call and searched in one Qdrant request
+    search_requests = [build_search_request(vector) for vector in embed(queries)]
+
+    search_results = get_qdrant_client().search_batch(
+        collection_name=app.config["COLLECTION"], requests=search_requests
+    )
+
+    return [serialize_results(search_result) for search_result in search_results]
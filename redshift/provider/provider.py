@@ -1,8 +1,8 @@
 import logging
-import backoff
+import time
+from itertools import islice
 from typing import Any
 
-import boto3
 from botocore.exceptions import ClientError
 from flask import current_app as app
 from .client import get_client
@@ -12,34 +12,75 @@ from . import UpstreamProviderError
 
 logger = logging.getLogger(__name__)
 
+# Statement polling starts short, then backs off while the statement keeps running
+POLL_INITIAL_INTERVAL_SECONDS = 0.05
+POLL_MAX_INTERVAL_SECONDS = 1
+POLL_BACKOFF_FACTOR = 1.5
+DEFAULT_POLL_TIMEOUT_SECONDS = 20
 
-def parse_data(response_data) -> list[dict[str, Any]]:
-    # Extract the metadata for column names
-    column_metadata = response_data["ColumnMetadata"]
-    column_names = [column["name"] for column in column_metadata]
+STATEMENT_FINISHED = "FINISHED"
+STATEMENT_FAILED = ["FAILED", "ABORTED"]
 
-    # Extract the records and transform them into a list of dictionaries
-    records = response_data["Records"]
-    formatted_records = []
 
-    for record in records:
-        formatted_record = {column_names[i]: value for i, value in enumerate(record)}
-        formatted_records.append(formatted_record)
+def get_field_value(field):
+    # Each field is keyed by its type, e.g. {"stringValue": "abc"} or {"isNull": True}
+    if field.get("isNull"):
+        return ""
+    (value,) = field.values()
+    return str(value)
 
-    return formatted_records
 
+def parse_data(column_names, records) -> list[dict[str, Any]]:
+    # AWS Redshift records are keyed by type, convert them to column names in one pass
+    return [dict(zip(column_names, map(get_field_value, record))) for record in records]
 
-@backoff.on_exception(backoff.expo, ClientError, max_time=20, max_tries=10)
-def get_statement_with_retry(client, execution_id):
-    statement_response = client.get_statement_result(
-        Id=execution_id,
-    )
 
-    return statement_response
+def wait_for_statement(client, execution_id, timeout):
+    deadline = time.monotonic() + timeout
+    interval = POLL_INITIAL_INTERVAL_SECONDS
+
+    while True:
+        describe_response = client.describe_statement(Id=execution_id)
+        status = describe_response["Status"]
+        if status == STATEMENT_FINISHED:
+            return describe_response
+        if status in STATEMENT_FAILED:
+            raise UpstreamProviderError(
+                f"Redshift statement {status.lower()}: {describe_response.get('Error')}"
+            )
+        if time.monotonic() + interval > deadline:
+            client.cancel_statement(Id=execution_id)
+            raise UpstreamProviderError(
+                f"Redshift statement did not finish within {timeout} seconds"
+            )
+
+        time.sleep(interval)
+        interval = min(interval * POLL_BACKOFF_FACTOR, POLL_MAX_INTERVAL_SECONDS)
+
+
+def iter_statement_records(client, execution_id):
+    # Follow result pages lazily, only as far as the caller consumes records
+    params = {"Id": execution_id}
+    while True:
+        results_response = client.get_statement_result(**params)
+        column_names = [column["name"] for column in results_response["ColumnMetadata"]]
+        yield from parse_data(column_names, results_response["Records"])
+
+        if not (next_token := results_response.get("NextToken")):
+            return
+        params["NextToken"] = next_token
 
 
 def search(query) -> list[dict[str, Any]]:
-    LIMIT_SIZE = app.config.get("LIMIT_SIZE", 100)
+    try:
+        LIMIT_SIZE = int(app.config.get("LIMIT_SIZE") or 100)
+        poll_timeout = float(
+            app.config.get("POLL_TIMEOUT") or DEFAULT_POLL_TIMEOUT_SECONDS
+        )
+    except ValueError:
+        raise ValueError(
+            "REDSHIFT_LIMIT_SIZE and REDSHIFT_POLL_TIMEOUT must be numbers"
+        )
     assert (
         db_name := app.config.get("DATABASE_NAME")
     ), "REDSHIFT_DATABASE_NAME must be set"
@@ -47,13 +88,15 @@ def search(query) -> list[dict[str, Any]]:
         workgroup_name := app.config.get("WORKGROUP_NAME")
     ), "REDSHIFT_WORKGROUP_NAME must be set"
     assert (
-        db_table := app.config.get("DATABASE_TABLE")
+        db_table := app.config.get("SEARCH_VIEW") or app.config.get("DATABASE_TABLE")
     ), "REDSHIFT_DATABASE_TABLE must be set"
     assert (
         db_column := app.config.get("DATABASE_COLUMN")
     ), "REDSHIFT_DATABASE_COLUMN must be set"
 
     redshift_client = get_client()
+    # The statement text is the same for every search, only the parameter changes,
+    # so Redshift can reuse the compiled plan
     sql_query = f"""
         SELECT * from {db_table}
         WHERE {db_column} ILIKE :query_param LIMIT {LIMIT_SIZE};
@@ -66,27 +109,25 @@ def search(query) -> list[dict[str, Any]]:
     ]
 
     try:
-        # Execute statement and then fetch the results with retries
-        # Redshift executes the statement asynchronously, we have to continuously
-        # poll for results with get_statement_result() to know the outcomes
+        # Redshift executes the statement asynchronously, poll its status with
+        # describe_statement() and only fetch results once it has finished
         execution_response = redshift_client.execute_statement(
             WorkgroupName=workgroup_name,
             Database=db_name,
             Sql=sql_query,
             Parameters=params,
         )
-        # Get result, with retries on the same execution ID
-        results_response = get_statement_with_retry(
-            redshift_client, execution_response["Id"]
+        describe_response = wait_for_statement(
+            redshift_client, execution_response["Id"], poll_timeout
         )
-    except ClientError as err:
-        # Finally, if all the retries fail then we can use describe_response()
-        # for a better understanding of why the execution failed
-        describe_response = redshift_client.describe_statement(
-            Id=execution_response["Id"]
+        if not describe_response.get("HasResultSet"):
+            return []
+
+        return list(
+            islice(
+                iter_statement_records(redshift_client, execution_response["Id"]),
+                LIMIT_SIZE,
+            )
         )
-        raise UpstreamProviderError(describe_response) from err
-
-    # AWS Redshift response is keyed by type, need to
-    # parse to column name instead
-    return parse_data(results_response)
+    except ClientError as err:
+        raise UpstreamProviderError(f"Redshift Data API error: {err}") from err
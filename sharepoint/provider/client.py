@@ -1,9 +1,9 @@
 import requests
 
-from msal import ConfidentialClientApplication
 from flask import current_app as app, request
 
 from . import UpstreamProviderError
+from .graph_auth import acquire_token_for_client
 
 AUTHORIZATION_HEADER = "Authorization"
 BEARER_PREFIX = "Bearer "
@@ -29,14 +29,8 @@ class SharepointClient:
 
     def set_app_access_token(self, tenant_id, client_id, client_secret):
         try:
-            credential = ConfidentialClientApplication(
-                client_id=client_id,
-                client_credential=client_secret,
-                authority=f"https://login.microsoftonline.com/{tenant_id}",
-            )
-
-            token_response = credential.acquire_token_for_client(
-                scopes=self.DEFAULT_SCOPES,
+            token_response = acquire_token_for_client(
+                tenant_id, client_id, client_secret, self.DEFAULT_SCOPES
             )
             if "access_token" not in token_response:
                 raise UpstreamProviderError(
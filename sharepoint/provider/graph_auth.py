@@ -0,0 +1,65 @@
+# Shared by the outlook, msteams and sharepoint connectors, which are packaged
+# separately. Keep the three copies identical.
+import hashlib
+import threading
+import time
+
+from msal import ConfidentialClientApplication
+
+# Refresh application tokens this long before they expire
+REFRESH_MARGIN_SECONDS = 5 * 60
+
+# Process-wide MSAL applications and tokens, keyed by tenant, client id and a hash
+# of the client secret, so the token round trip to login.microsoftonline.com is not
+# repeated for every search, and a rotated secret is picked up straight away
+msal_apps = {}
+app_tokens = {}
+# One lock per token key, so fetching a token doesn't hold up other credentials
+token_locks = {}
+lock = threading.Lock()
+
+
+def secret_hash(client_secret):
+    return hashlib.sha256(client_secret.encode()).hexdigest()
+
+
+def get_msal_app(tenant_id, client_id, client_secret):
+    key = (tenant_id, client_id, secret_hash(client_secret))
+    if (msal_app := msal_apps.get(key)) is None:
+        # Built outside the lock, since it can discover the authority over the
+        # network. If two threads race, the first application stored is kept
+        msal_app = msal_apps.setdefault(
+            key,
+            ConfidentialClientApplication(
+                client_id=client_id,
+                client_credential=client_secret,
+                authority=f"https://login.microsoftonline.com/{tenant_id}",
+            ),
+        )
+
+    return msal_app
+
+
+def acquire_token_for_client(tenant_id, client_id, client_secret, scopes):
+    key = (tenant_id, client_id, secret_hash(client_secret), tuple(scopes))
+    with lock:
+        token_lock = token_locks.setdefault(key, threading.Lock())
+
+    # Hold the key's lock while refreshing so concurrent requests share one token call
+    with token_lock:
+        token = app_tokens.get(key)
+        if (
+            token is not None
+            and token["expires_at"] - REFRESH_MARGIN_SECONDS > time.time()
+        ):
+            return token
+
+        credential = get_msal_app(tenant_id, client_id, client_secret)
+        token_response = credential.acquire_token_for_client(scopes=scopes)
+        if "access_token" in token_response:
+            token_response["expires_at"] = time.time() + int(
+                token_response.get("expires_in", 0)
+            )
+            app_tokens[key] = token_response
+
+        return token_response
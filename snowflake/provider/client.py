@@ -10,6 +10,11 @@ client = None
 
 
 class SnowflakeClient:
+    CONTAINS_SEARCH_MODE = "contains"
+    # Uses the SEARCH function, served by a FULL_TEXT search optimization on the table
+    SEARCH_OPTIMIZATION_MODE = "search"
+    SEARCH_MODES = [CONTAINS_SEARCH_MODE, SEARCH_OPTIMIZATION_MODE]
+
     def __init__(
         self,
         user,
@@ -21,35 +26,52 @@ class SnowflakeClient:
         table,
         mappings,
         search_limit,
+        search_mode=CONTAINS_SEARCH_MODE,
     ):
-        try:
-            self.connection = snowflake.connector.connect(
-                user=user,
-                password=password,
-                warehouse=warehouse,
-                account=account,
-                database=database,
-            )
-        except SnowflakeError as err:
-            raise UpstreamProviderError("Error connecting to Snowflake") from err
-
+        self.connection_params = {
+            "user": user,
+            "password": password,
+            "warehouse": warehouse,
+            "account": account,
+            "database": database,
+            "schema": schema,
+            # Bind on the server so the statement text, and the result cache, stay stable
+            "paramstyle": "qmark",
+            "client_session_keep_alive": True,
+        }
         self.database = database
         self.schema = schema
         self.table = table
         self.mappings = mappings
         self.search_limit = search_limit
+        self.search_mode = search_mode
+        # SQL text by number of query words
+        self.statements = {}
+        self.connection = None
+        self._connect()
 
-    def search(self, query):
-        connection = self.connection
-        search_fields = list(self.mappings.keys())
-        words = query.split(" ")
+    def _connect(self):
+        try:
+            self.connection = snowflake.connector.connect(**self.connection_params)
+        except SnowflakeError as err:
+            raise UpstreamProviderError("Error connecting to Snowflake") from err
 
-        constraints = " or ".join(
-            map(lambda p: f"contains({p[0]}, %s)", product(search_fields, words))
-        )
+    def _get_statement(self, word_count):
+        if word_count in self.statements:
+            return self.statements[word_count]
+
+        search_fields = list(self.mappings.keys())
+        if self.search_mode == self.SEARCH_OPTIMIZATION_MODE:
+            constraints = f"SEARCH(({', '.join(search_fields)}), ?)"
+        else:
+            constraints = " or ".join(
+                map(
+                    lambda p: f"contains({p[0]}, ?)",
+                    product(search_fields, range(word_count)),
+                )
+            )
 
-        connection.cursor().execute(f"USE DATABASE {self.database};")
-        query = f"""
+        statement = f"""
             SELECT
             *
             FROM
@@ -58,9 +80,43 @@ class SnowflakeClient:
             LIMIT
             {self.search_limit};
         """
+        self.statements[word_count] = statement
+
+        return statement
+
+    def _execute(self, statement, params):
+        cursor = self.connection.cursor(DictCursor)
+        return cursor.execute(statement, params).fetchall()
+
+    def search(self, query):
+        words = query.split()
+        if not words:
+            return []
+
+        if self.search_mode == self.SEARCH_OPTIMIZATION_MODE:
+            statement = self._get_statement(1)
+            params = [" ".join(words)]
+        else:
+            statement = self._get_statement(len(words))
+            params = words * len(self.mappings)
+
+        if self.connection.is_closed():
+            self._connect()
 
-        cursor = connection.cursor(DictCursor)
-        return cursor.execute(query, words * len(search_fields))
+        try:
+            return self._execute(statement, params)
+        except SnowflakeError as err:
+            if not self.connection.is_closed():
+                raise UpstreamProviderError(
+                    f"Error searching Snowflake: {err}"
+                ) from err
+
+        # The session was dropped, reconnect once and retry
+        self._connect()
+        try:
+            return self._execute(statement, params)
+        except SnowflakeError as err:
+            raise UpstreamProviderError(f"Error searching Snowflake: {err}") from err
 
 
 def get_client():
@@ -83,6 +139,12 @@ def get_client():
             mappings := app.config.get("SEARCH_FIELDS_MAPPING")
         ), "SNOWFLAKE_SEARCH_FIELDS_MAPPINGS must be set"
         search_limit = app.config.get("SEARCH_LIMIT", 10)
+        search_mode = app.config.get(
+            "SEARCH_MODE", SnowflakeClient.CONTAINS_SEARCH_MODE
+        )
+        assert (
+            search_mode in SnowflakeClient.SEARCH_MODES
+        ), 'SNOWFLAKE_SEARCH_MODE must be "contains" or "search"'
 
         client = SnowflakeClient(
             user,
@@ -94,6 +156,7 @@ def get_client():
             table,
             mappings,
             search_limit,
+            search_mode,
         )
 
     return client
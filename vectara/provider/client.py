@@ -0,0 +1,294 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from dictdot import dictdot
+from flask import current_app as app
+
+from . import UpstreamProviderError
+
+logger = logging.getLogger(__name__)
+
+V1_QUERY_URL = "https://api.vectara.io/v1/query"
+V2_QUERY_URL = "https://api.vectara.io/v2/query"
+API_VERSIONS = ["v1", "v2"]
+
+START_SNIPPET = "<%START%>"
+END_SNIPPET = "<%END%>"
+MMR_RERANKER_ID = 272725718
+
+DEFAULT_CACHE_TTL_SECONDS = 300
+CACHE_SIZE = 1000
+
+ERROR_CODES = [
+    "BAD_REQUEST",
+    "UNAUTHORIZED",
+    "FORBIDDEN",
+    "NOT_FOUND",
+    "METHOD_NOT_ALLOWED",
+    "CONFLICT",
+    "UNSUPPORTED_MEDIA_TYPE",
+    "TOO_MANY_REQUESTS",
+    "INTERNAL_SERVER_ERROR",
+    "NOT_IMPLEMENTED",
+    "SERVICE_UNAVAILABLE",
+    "INSUFFICIENT_STORAGE",
+]
+
+client = None
+
+
+def _remove_snippet(s: str) -> str:
+    return s.replace(START_SNIPPET, "").replace(END_SNIPPET, "")
+
+
+class VectaraClient:
+    def __init__(self, config):
+        self.config = config
+        self.session = requests.Session()
+        self.session.headers.update(
+            {
+                "x-api-key": config.api_key,
+                "customer-id": config.customer_id,
+                "Content-Type": "application/json",
+                "X-Source": "cohere-connect",
+            }
+        )
+        self.corpus_set = frozenset(config.corpora)
+        self.cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+
+        # Everything but the query text is fixed, so build the corpus payloads once
+        if config.api_version == "v2":
+            self.corpora = [
+                {
+                    "corpus_key": corpus_key,
+                    "lexical_interpolation": config.lambda_val,
+                    **({"metadata_filter": config.filter} if config.filter else {}),
+                }
+                for corpus_key in config.corpora
+            ]
+        else:
+            self.corpora = [
+                {
+                    "customerId": config.customer_id,
+                    "corpusId": corpus_id,
+                    "lexicalInterpolationConfig": {"lambda": config.lambda_val},
+                    **({"metadataFilter": config.filter} if config.filter else {}),
+                }
+                for corpus_id in config.corpora
+            ]
+
+    def query(self, query: str) -> list:
+        key = (query, self.corpus_set, self.config.filter)
+        if (results := self._cache_get(key)) is not None:
+            return results
+
+        if self.config.api_version == "v2":
+            results = self._query_v2(query)
+        else:
+            results = self._query_v1(query)
+
+        self._cache_put(key, results)
+        return results
+
+    def _cache_get(self, key):
+        with self.cache_lock:
+            if (entry := self.cache.get(key)) is None:
+                return None
+            expires_at, results = entry
+            if expires_at < time.monotonic():
+                del self.cache[key]
+                return None
+            self.cache.move_to_end(key)
+            return results
+
+    def _cache_put(self, key, results):
+        if self.config.cache_ttl <= 0:
+            return
+        with self.cache_lock:
+            self.cache[key] = (time.monotonic() + self.config.cache_ttl, results)
+            self.cache.move_to_end(key)
+            if len(self.cache) > CACHE_SIZE:
+                self.cache.popitem(last=False)
+
+    def _post(self, url, data, stream=False):
+        try:
+            response = self.session.post(
+                url,
+                data=json.dumps(data),
+                timeout=self.config.timeout,
+                stream=stream,
+            )
+        except requests.RequestException as error:
+            raise UpstreamProviderError(f"Error querying Vectara: {error}") from error
+
+        if response.status_code != 200:
+            message = (
+                f"Query failed (code {response.status_code}, reason {response.reason}, "
+                f"details {response.text})"
+            )
+            response.close()
+            raise UpstreamProviderError(message)
+
+        return response
+
+    def _query_v1(self, query: str) -> list:
+        config = self.config
+        data = {
+            "query": [
+                {
+                    "query": query,
+                    "start": 0,
+                    "numResults": (
+                        config.mmr_k if config.mmr else config.similarity_top_k
+                    ),
+                    "contextConfig": {
+                        "sentencesBefore": config.n_sentences_before,
+                        "sentencesAfter": config.n_sentences_after,
+                        "startTag": START_SNIPPET,
+                        "endTag": END_SNIPPET,
+                    },
+                    "corpusKey": self.corpora,
+                }
+            ]
+        }
+        if config.mmr:
+            data["query"][0]["rerankingConfig"] = {
+                "rerankerId": MMR_RERANKER_ID,
+                "mmrConfig": {"diversityBias": config.mmr_diversity_bias},
+            }
+
+        result = self._post(V1_QUERY_URL, data).json()
+
+        responses = result["responseSet"][0]["response"]
+        documents = result["responseSet"][0]["document"]
+
+        status_list = result["responseSet"][0]["status"]
+        if len(status_list) > 0 and status_list[0]["code"] in ERROR_CODES:
+            logger.error("Query failed: %s", result)
+            # Raise rather than return no results, which would be cached
+            raise UpstreamProviderError(f"Query failed: {status_list[0]['code']}")
+
+        res = []
+        for resp in responses[: config.similarity_top_k]:
+            md = {m["name"]: m["value"] for m in resp["metadata"]}
+            doc_inx = resp["documentIndex"]
+            doc_id = documents[doc_inx]["id"]
+            doc_md = {m["name"]: m["value"] for m in documents[doc_inx]["metadata"]}
+            item = {"id": doc_id, "text": _remove_snippet(resp["text"])}
+            item.update(doc_md)
+            item.update(md)
+            res.append(item)
+
+        return res
+
+    def _query_v2(self, query: str) -> list:
+        config = self.config
+        data = {
+            "query": query,
+            "search": {
+                "corpora": self.corpora,
+                "offset": 0,
+                "limit": config.mmr_k if config.mmr else config.similarity_top_k,
+                "context_configuration": {
+                    "sentences_before": config.n_sentences_before,
+                    "sentences_after": config.n_sentences_after,
+                    "start_tag": START_SNIPPET,
+                    "end_tag": END_SNIPPET,
+                },
+            },
+            "stream_response": True,
+        }
+        if config.mmr:
+            data["search"]["reranker"] = {
+                "type": "mmr",
+                "diversity_bias": config.mmr_diversity_bias,
+            }
+
+        # The search results arrive as the first server-sent event, stop reading the
+        # stream as soon as they are in
+        with self._post(V2_QUERY_URL, data, stream=True) as response:
+            for event in self._iter_events(response):
+                if event.get("type") == "search_results":
+                    search_results = event.get("search_results", [])
+                    break
+                if event.get("type") == "error":
+                    raise UpstreamProviderError(
+                        f"Query failed: {', '.join(event.get('messages', []))}"
+                    )
+            else:
+                search_results = []
+
+        res = []
+        for search_result in search_results[: config.similarity_top_k]:
+            item = {
+                "id": search_result.get("document_id"),
+                "text": _remove_snippet(search_result.get("text", "")),
+            }
+            item.update(search_result.get("document_metadata", {}))
+            item.update(search_result.get("part_metadata", {}))
+            res.append(item)
+
+        return res
+
+    def _iter_events(self, response):
+        data_lines = []
+        # Server-sent events are always UTF-8, whatever the Content-Type says
+        response.encoding = "utf-8"
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("data:"):
+                data_lines.append(line.removeprefix("data:").strip())
+            elif not line and data_lines:
+                yield json.loads("\n".join(data_lines))
+                data_lines = []
+        if data_lines:
+            yield json.loads("\n".join(data_lines))
+
+
+def get_client():
+    global client
+    if client is not None:
+        return client
+
+    assert (apikey := app.config.get("API_KEY")), "VECTARA_API_KEY env var must be set"
+
+    assert (
+        customer_id := app.config.get("CUSTOMER_ID")
+    ), "VECTARA_CUSTOMER_ID env var must be set"
+
+    api_version = app.config.get("API_VERSION", "v1")
+    assert (
+        api_version in API_VERSIONS
+    ), f"VECTARA_API_VERSION must be one of {', '.join(API_VERSIONS)}"
+
+    # v2 addresses corpora by key, v1 by numeric ID
+    corpus_setting = "CORPUS_KEY" if api_version == "v2" else "CORPUS_ID"
+    assert (
+        corpora := app.config.get(corpus_setting)
+    ), f"VECTARA_{corpus_setting} env var must be set"
+
+    config = dictdot(
+        {
+            "api_key": str(apikey),
+            "customer_id": str(customer_id),
+            "api_version": api_version,
+            "corpora": str(corpora).split(","),
+            "lambda_val": 0.025,
+            "filter": app.config.get("METADATA_FILTER", ""),
+            "similarity_top_k": 10,
+            "mmr": True,
+            "mmr_k": 50,
+            "mmr_diversity_bias": 0.3,
+            "n_sentences_before": 2,
+            "n_sentences_after": 2,
+            "timeout": 120,
+            "cache_ttl": float(app.config.get("CACHE_TTL", DEFAULT_CACHE_TTL_SECONDS)),
+        }
+    )
+
+    client = VectaraClient(config)
+    return client
@@ -1,11 +1,25 @@
 import logging
+import threading
+import time
+from urllib.parse import urlparse
 
 import weaviate
 from flask import current_app as app
+from weaviate.exceptions import WeaviateBaseError
+
+from . import UpstreamProviderError
 
 logger = logging.getLogger(__name__)
 client = None
 
+DEFAULT_SEARCH_LIMIT = 10
+DEFAULT_SCHEMA_REFRESH_SECONDS = 300
+
+# Class properties are cached between searches instead of downloading the
+# whole schema on every query
+schema_properties_cache = {}
+schema_lock = threading.Lock()
+
 
 def serialize_results(data, mappings):
     """
@@ -35,26 +49,76 @@ def serialize_results(data, mappings):
 
 def configure_client(url):
     global client
-    client = weaviate.Client(
-        url=url,
-    )
+
+    if grpc_port := app.config.get("GRPC_PORT"):
+        # The v4 client queries over gRPC, with HTTP only used for setup
+        parsed_url = urlparse(url)
+        secure = parsed_url.scheme == "https"
+        client = weaviate.connect_to_custom(
+            http_host=parsed_url.hostname,
+            http_port=parsed_url.port or (443 if secure else 80),
+            http_secure=secure,
+            grpc_host=app.config.get("GRPC_HOST", parsed_url.hostname),
+            grpc_port=int(grpc_port),
+            grpc_secure=secure,
+        )
+    else:
+        # The v3 API, deprecated in the v4 client and removed in 4.10, keeps
+        # GraphQL searches working against servers without gRPC
+        client = weaviate.Client(
+            url=url,
+        )
 
 
-def get_schema_properties(schema_class, url):
+def get_schema_properties(schema_class, url, refresh=False):
     if not client:
         configure_client(url)
 
-    schema = client.schema.get()
-    schema_properties = []
+    refresh_seconds = float(
+        app.config.get("SCHEMA_REFRESH_SECONDS", DEFAULT_SCHEMA_REFRESH_SECONDS)
+    )
+
+    with schema_lock:
+        cached = schema_properties_cache.get(schema_class)
+        if cached and not refresh and cached["expires_at"] > time.monotonic():
+            return cached["properties"]
 
-    for class_info in schema["classes"]:
-        if class_info["class"] == schema_class:
-            schema_properties = [prop["name"] for prop in class_info["properties"]]
-            break
+        schema = client.schema.get(schema_class)
+        schema_properties = [prop["name"] for prop in schema.get("properties", [])]
+        schema_properties_cache[schema_class] = {
+            "properties": schema_properties,
+            "expires_at": time.monotonic() + refresh_seconds,
+        }
 
     return schema_properties
 
 
+def near_text_grpc(schema_class, query, properties, limit):
+    collection = client.collections.get(schema_class)
+    # Without explicit properties, the v4 client returns every non-reference
+    # property, so no schema lookup is needed
+    response = collection.query.near_text(
+        query=query,
+        limit=limit,
+        return_properties=properties or None,
+    )
+    return [dict(item.properties) for item in response.objects]
+
+
+def near_text_graphql(schema_class, query, properties, limit):
+    response = (
+        client.query.get(schema_class, properties)
+        .with_near_text({"concepts": [query]})
+        .with_limit(limit)
+        .do()
+    )
+    if errors := response.get("errors"):
+        raise UpstreamProviderError(
+            ", ".join(error.get("message", str(error)) for error in errors)
+        )
+    return response["data"]["Get"][schema_class] or []
+
+
 def search(query):
     assert (url := app.config.get("SERVER_URL")), "WEAVIATE_SERVER_URL must be set"
     assert (
@@ -63,19 +127,37 @@ def search(query):
     if not client:
         configure_client(url)
 
-    schema_properties = get_schema_properties(schema_class, url)
+    limit = int(app.config.get("SEARCH_LIMIT", DEFAULT_SEARCH_LIMIT))
+    properties = [
+        prop.strip()
+        for prop in app.config.get("PROPERTIES", "").split(",")
+        if prop.strip()
+    ]
+
+    try:
+        if app.config.get("GRPC_PORT"):
+            results = near_text_grpc(schema_class, query, properties, limit)
+        elif properties:
+            results = near_text_graphql(schema_class, query, properties, limit)
+        else:
+            try:
+                results = near_text_graphql(
+                    schema_class,
+                    query,
+                    get_schema_properties(schema_class, url),
+                    limit,
+                )
+            except UpstreamProviderError:
+                # The cached properties may be stale after a schema change,
+                # refresh them and retry once
+                results = near_text_graphql(
+                    schema_class,
+                    query,
+                    get_schema_properties(schema_class, url, refresh=True),
+                    limit,
+                )
+    except WeaviateBaseError as error:
+        raise UpstreamProviderError(f"Error searching Weaviate: {error}") from error
 
-    nearText = {"concepts": [query]}
-    response = (
-        client.query.get(schema_class, list(schema_properties))
-        .with_near_text(nearText)
-        .with_limit(10)
-        .do()
-    )
     mappings = app.config.get("CONNECTOR_FIELDS_MAPPING", {})
-    results = (
-        response["data"]["Get"][schema_class]
-        if response["data"]["Get"][schema_class]
-        else []
-    )
     return serialize_results(results, mappings)